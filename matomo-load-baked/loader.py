@@ -1,17 +1,35 @@
 #!/usr/bin/env python3
 import os
 import asyncio
+import contextlib
+import functools
 import random
 import time
 import signal
+import socket
 import aiohttp
 import logging
 import urllib.parse
 import ipaddress
+import itertools
 import json
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from fractions import Fraction
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Sequence
 import pytz
+from yarl import URL
+
+try:
+    from watchfiles import awatch
+except ImportError:  # optional; wait_for_start_signal falls back to polling
+    awatch = None
+
+try:
+    import uvloop
+except ImportError:  # optional; the default asyncio loop is used instead
+    uvloop = None
 
 # ---- Configuration via environment variables ----
 MATOMO_URL = os.environ.get("MATOMO_URL", "https://matomo.example.com/matomo.php").rstrip("/")
@@ -29,6 +47,8 @@ TARGET_VISITS_PER_DAY = float(os.environ.get("TARGET_VISITS_PER_DAY", "20000"))
 PAGEVIEWS_MIN = int(os.environ.get("PAGEVIEWS_MIN", "3"))
 PAGEVIEWS_MAX = int(os.environ.get("PAGEVIEWS_MAX", "6"))
 CONCURRENCY = int(os.environ.get("CONCURRENCY", "50"))
+# HTTP connection pool size; 0 = derive from CONCURRENCY with headroom for connects in progress
+CONNECTOR_LIMIT = int(os.environ.get("CONNECTOR_LIMIT", "0"))
 PAUSE_BETWEEN_PVS_MIN = float(os.environ.get("PAUSE_BETWEEN_PVS_MIN", "0.5"))
 PAUSE_BETWEEN_PVS_MAX = float(os.environ.get("PAUSE_BETWEEN_PVS_MAX", "2.0"))
 
@@ -94,6 +114,21 @@ AUTO_START = _parse_bool(os.environ.get("AUTO_START"), default=True)
 START_SIGNAL_FILE = os.environ.get("START_SIGNAL_FILE", "/app/data/loadgen.start")
 START_CHECK_INTERVAL = float(os.environ.get("START_CHECK_INTERVAL", "2.0"))
 
+# Send each visit's hits as one POST to Matomo's bulk tracking API instead of one GET per hit
+BULK_TRACKING = _parse_bool(os.environ.get("BULK_TRACKING"), default=False)
+# Send a visit's pageviews as staggered tasks instead of awaiting each one before the pause
+PARALLEL_PVS = _parse_bool(os.environ.get("PARALLEL_PVS"), default=False)
+
+# Tracking parameters shared by every hit, URL-encoded once at import
+_BASE_PARAMS = {'idsite': SITE_ID, 'rec': 1, 'apiv': 1, 'send_image': 0}
+if MATOMO_TOKEN_AUTH:
+    # Include token_auth whenever provided so Matomo accepts overridden cdt/cip
+    _BASE_PARAMS['token_auth'] = MATOMO_TOKEN_AUTH
+_BASE_QS = urllib.parse.urlencode(_BASE_PARAMS)
+
+# Cache-buster for the rand param: any non-negative 31-bit int will do
+_RAND31 = functools.partial(random.getrandbits, 31)
+
 USER_AGENTS = [
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0 Safari/537.36',
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:117.0) Gecko/20100101 Firefox/117.0',
@@ -101,6 +136,9 @@ USER_AGENTS = [
     'Mozilla/5.0 (iPhone; CPU iPhone OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
 ]
 
+# Request headers per user agent, built once; hits only reference them
+_UA_HEADERS = MappingProxyType({ua: {'User-Agent': ua} for ua in USER_AGENTS})
+
 # Search terms for site search functionality
 SEARCH_TERMS = [
     'product', 'service', 'contact', 'about', 'help', 'support', 'pricing', 'features',
@@ -177,7 +215,7 @@ RANDOM_EVENTS = [
 ]
 
 # Traffic sources for realistic referrer simulation
-REFERRER_SOURCES = {
+REFERRER_SOURCES = MappingProxyType({
     'search_engines': {
         'probability': 0.35,  # 35% from search engines
         'referrers': [
@@ -229,7 +267,7 @@ REFERRER_SOURCES = {
         ]
     }
     # Note: Direct traffic (30%) is handled by not setting a referrer
-}
+})
 
 SUPPORTED_FUNNEL_STEP_TYPES = {
     'pageview',
@@ -241,8 +279,12 @@ SUPPORTED_FUNNEL_STEP_TYPES = {
 }
 
 
+@functools.lru_cache(maxsize=1)
 def resolve_timezone():
-    """Return a pytz timezone object, defaulting to UTC on error."""
+    """Return a pytz timezone object, defaulting to UTC on error.
+
+    TIMEZONE is fixed for the lifetime of the process, so the lookup is cached.
+    """
     try:
         return pytz.timezone(TIMEZONE)
     except Exception:
@@ -305,6 +347,12 @@ def format_cdt(dt):
     Matomo expects cdt to be in UTC timezone. This function converts
     timezone-aware datetimes to UTC before formatting.
     """
+    # cdt has one-second resolution, so hits within the same second share a cache entry
+    return _format_cdt_second(dt.replace(microsecond=0))
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_cdt_second(dt):
     if dt.tzinfo is not None:
         # Convert to UTC
         utc_dt = dt.astimezone(pytz.UTC)
@@ -314,6 +362,25 @@ def format_cdt(dt):
     return utc_dt.strftime('%Y-%m-%d %H:%M:%S')
 
 
+@functools.lru_cache(maxsize=256)
+def _base_url(page_url: str) -> str:
+    """Return scheme://netloc for a page URL (cached; page URLs come from a bounded list)."""
+    parsed = urllib.parse.urlparse(page_url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _resolve_link(page_url: str, target: str) -> str:
+    """Resolve an outlink/download target against the page's origin.
+
+    Absolute http(s) targets are returned unchanged. Both page URLs and link targets
+    come from bounded lists, so resolved URLs are served from the cache at steady state.
+    """
+    if target.startswith(('http://', 'https://')):
+        return target
+    return urllib.parse.urljoin(_base_url(page_url), target)
+
+
 def load_funnels_from_file(path: str) -> List[Dict[str, Any]]:
     """Load funnel definitions from JSON file."""
     if not path or not os.path.exists(path):
@@ -395,19 +462,38 @@ def load_funnels_from_file(path: str) -> List[Dict[str, Any]]:
     return funnels
 
 
+def set_funnels(funnels: List[Dict[str, Any]]) -> None:
+    """Install funnel definitions into the global cache and refresh derived flags."""
+    global FUNNELS, _HAS_FUNNELS
+    FUNNELS = funnels
+    # Most installs ship without funnels; let select_funnel bail out on one flag check
+    _HAS_FUNNELS = any(funnel.get("probability", 0.0) > 0 for funnel in funnels)
+
+    total_probability = sum(funnel.get("probability", 0.0) for funnel in funnels)
+    if total_probability > 1.0:
+        logging.warning(
+            "Funnel probabilities sum to %.2f (> 1.0); lower-priority funnels will rarely run",
+            total_probability,
+        )
+
+
 def reload_funnels(path: Optional[str] = None) -> None:
     """Reload funnel definitions into global cache."""
-    global FUNNELS
     config_path = path or FUNNEL_CONFIG_PATH
-    FUNNELS = load_funnels_from_file(config_path)
+    set_funnels(load_funnels_from_file(config_path))
 
 
-FUNNELS: List[Dict[str, Any]] = load_funnels_from_file(FUNNEL_CONFIG_PATH)
+FUNNELS: List[Dict[str, Any]] = []
+_HAS_FUNNELS = False
+reload_funnels()
 
 
 def select_funnel() -> Optional[Dict[str, Any]]:
-    """Randomly select a funnel to execute for the next visit."""
-    if not FUNNELS:
+    """Randomly select a funnel to execute for the next visit.
+
+    Only reads the FUNNELS cache, so it is safe to call from concurrent visit tasks.
+    """
+    if not _HAS_FUNNELS:
         return None
 
     for funnel in FUNNELS:
@@ -416,7 +502,7 @@ def select_funnel() -> Optional[Dict[str, Any]]:
     return None
 
 # Country distribution for visitor geolocation (based on typical web analytics patterns)
-COUNTRY_IP_RANGES = {
+COUNTRY_IP_RANGES = MappingProxyType({
     'United States': {
         'probability': 0.35,  # 35% US traffic
         'ip_ranges': [
@@ -524,10 +610,34 @@ COUNTRY_IP_RANGES = {
             '36.0.0.0/8',        # Various Asian
         ]
     }
-}
+})
+
+# Flattened (country, first_address, host_count) entries with cumulative weights that
+# split each country's probability evenly across its ranges, so a visitor's country and
+# range come from a single random.choices call. CIDRs are parsed once, here, into plain
+# ints (all ranges are IPv4): first_address is the network address and host_count
+# excludes it and the broadcast address.
+_FLAT_COUNTRY_RANGES = tuple(
+    (country, int(network.network_address), network.num_addresses - 2)
+    for country, config in COUNTRY_IP_RANGES.items()
+    for network in map(ipaddress.ip_network, config['ip_ranges'])
+)
+_FLAT_COUNTRY_CUM_WEIGHTS = tuple(itertools.accumulate(
+    COUNTRY_IP_RANGES[country]['probability'] / len(COUNTRY_IP_RANGES[country]['ip_ranges'])
+    for country, _, _ in _FLAT_COUNTRY_RANGES
+))
+
+# Fail fast at import instead of per visit if a range has no usable host addresses
+_TOO_SMALL_COUNTRY_RANGES = [
+    f"{country} {ipaddress.IPv4Address(first_address)}"
+    for country, first_address, host_count in _FLAT_COUNTRY_RANGES
+    if host_count < 1
+]
+if _TOO_SMALL_COUNTRY_RANGES:
+    raise ValueError(f"Country IP ranges too small to pick a host from: {_TOO_SMALL_COUNTRY_RANGES}")
 
 # Ecommerce products database for realistic order simulation
-ECOMMERCE_PRODUCTS = {
+ECOMMERCE_PRODUCTS = MappingProxyType({
     'Electronics': [
         {'sku': 'PHONE-001', 'name': 'Smartphone Pro Max', 'price': 899.99},
         {'sku': 'PHONE-002', 'name': 'Budget Smartphone', 'price': 199.99},
@@ -588,7 +698,29 @@ ECOMMERCE_PRODUCTS = {
         {'sku': 'SPORT-009', 'name': 'Resistance Bands', 'price': 19.99},
         {'sku': 'SPORT-010', 'name': 'Fitness Tracker', 'price': 149.99}
     ]
-}
+})
+
+# Flattened (category, product, json_prefix) entries with cumulative weights that keep
+# every category equally likely, so an order's items are drawn with one random.choices
+# call. json_prefix is the pre-escaped '["sku","name","category",' head of the item.
+_FLAT_PRODUCTS = tuple(
+    (
+        category,
+        product,
+        '[' + ','.join(json.dumps(value) for value in (product['sku'], product['name'], category)) + ',',
+    )
+    for category, products in ECOMMERCE_PRODUCTS.items()
+    for product in products
+)
+_FLAT_PRODUCT_CUM_WEIGHTS = tuple(itertools.accumulate(
+    1.0 / len(ECOMMERCE_PRODUCTS[category]) for category, _, _ in _FLAT_PRODUCTS
+))
+_ITEM_JSON_PREFIXES = MappingProxyType({
+    (product['sku'], category): json_prefix for category, product, json_prefix in _FLAT_PRODUCTS
+})
+
+# Chance of keeping a drawn item count of 1..5 (otherwise the order collapses to 1 item)
+_ITEM_COUNT_WEIGHTS = (0.6, 0.25, 0.1, 0.04, 0.01)  # Favor 1-2 items
 
 def resolve_urls_file() -> str:
     """
@@ -608,21 +740,25 @@ def resolve_urls_file() -> str:
     )
 
 
-def read_urls(path):
-    urls = []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            s = line.strip()
-            if not s or s.startswith('#'):
-                continue
-            urls.append(s.split()[0])
+def read_urls(path) -> tuple:
+    """Return the unique URLs from a URLs file, in file order.
+
+    Blank lines and # comments are skipped; only the first whitespace-separated
+    field of each line is used.
+    """
+    lines = (line.strip() for line in Path(path).read_text(encoding='utf-8').splitlines())
+    urls = tuple(dict.fromkeys(s.split(None, 1)[0] for s in lines if s and not s.startswith('#')))
     if not urls:
         raise RuntimeError(f"No URLs found in URLs file: {path}")
     return urls
 
+# Per-visit helpers. They keep no state of their own and read configuration from
+# module globals at call time, so concurrent visit tasks can call them freely.
+
+
 def choose_referrer():
     """Choose a referrer based on realistic traffic source probabilities.
-    
+
     Returns:
         str or None: Referrer URL, or None for direct traffic
     """
@@ -633,10 +769,9 @@ def choose_referrer():
         return None
     
     # Remaining probability distributed among referrer sources
-    remaining_prob = 1.0 - DIRECT_TRAFFIC_PROBABILITY
     current_prob = DIRECT_TRAFFIC_PROBABILITY
     
-    for source_type, config in REFERRER_SOURCES.items():
+    for config in REFERRER_SOURCES.values():
         source_prob = config['probability']
         if rand < current_prob + source_prob:
             return random.choice(config['referrers'])
@@ -645,49 +780,71 @@ def choose_referrer():
     # Fallback to direct traffic if probabilities don't add up to 1.0
     return None
 
+def _draw_country_ranges(k: int) -> List[tuple]:
+    # Weighted draw of country and IP range in one step. The weights are normalised
+    # by their total, so no fallback is needed if the probabilities don't sum to 1.
+    return random.choices(_FLAT_COUNTRY_RANGES, cum_weights=_FLAT_COUNTRY_CUM_WEIGHTS, k=k)
+
+
+def _host_ip(first_address: int, host_count: int) -> str:
+    # Random host in the range, avoiding the network and broadcast addresses
+    return socket.inet_ntoa((first_address + random.randint(1, host_count)).to_bytes(4, 'big'))
+
+
 def choose_country_and_ip():
     """Choose a country based on realistic distribution and generate an IP from that country.
-    
+
     Returns:
         tuple: (country_name, ip_address) or (None, None) if disabled
     """
     if not RANDOMIZE_VISITOR_COUNTRIES:
         return None, None
     
-    rand = random.random()
-    current_prob = 0.0
-    
-    for country, config in COUNTRY_IP_RANGES.items():
-        current_prob += config['probability']
-        if rand < current_prob:
-            # Choose random IP range from this country
-            ip_range = random.choice(config['ip_ranges'])
-            # Generate random IP within the chosen range
-            network = ipaddress.ip_network(ip_range)
-            # Get a random IP from the network (avoiding network and broadcast addresses)
-            random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-            return country, str(random_ip)
-    
-    # Fallback to US if probabilities don't add up
-    us_range = random.choice(COUNTRY_IP_RANGES['United States']['ip_ranges'])
-    network = ipaddress.ip_network(us_range)
-    random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-    return 'United States', str(random_ip)
+    country, first_address, host_count = _draw_country_ranges(1)[0]
+    return country, _host_ip(first_address, host_count)
+
+
+def choose_countries_and_ips(n: int):
+    """Draw n visitors' countries and IPs at once.
+
+    Same distribution as choose_country_and_ip(), but a single weighted
+    choices() call picks the ranges for the whole batch.
+
+    Returns:
+        tuple: (countries, ip_addresses) lists of length n, all None if disabled
+    """
+    if not RANDOMIZE_VISITOR_COUNTRIES:
+        return [None] * n, [None] * n
+
+    picks = _draw_country_ranges(n)
+    countries = [country for country, _, _ in picks]
+    ips = [_host_ip(first_address, host_count) for _, first_address, host_count in picks]
+    return countries, ips
 
 def rand_hex(n=16):
-    import random
-    return ''.join(random.choice('0123456789abcdef') for _ in range(n))
+    # Drawn from the module RNG (not os.urandom) so BACKFILL_SEED keeps runs reproducible
+    return f'{random.getrandbits(n * 4):0{n}x}'
+
+@functools.lru_cache(maxsize=8)
+def _exact_rate(rate: float) -> Fraction:
+    """Return a configured rate as the exact decimal it was written as (0.08875 stays 0.08875)."""
+    return Fraction(repr(rate))
 
-def generate_ecommerce_order():
+
+def generate_ecommerce_order(force: bool = False):
     """Generate a realistic ecommerce order with items, pricing, and metadata.
-    
+
+    Args:
+        force: Skip the ECOMMERCE_PROBABILITY roll and always build an order.
+
     Returns:
-        tuple: (order_id, items_json, revenue, subtotal, tax, shipping) or None if no order
+        tuple: (order_id, items, revenue, subtotal, tax, shipping) or None if no order.
+        items is a list of [sku, name, category, price, quantity]; serialize it with
+        encode_ecommerce_items() when building the ec_items parameter.
     """
-    if random.random() >= ECOMMERCE_PROBABILITY:
+    if not force and random.random() >= ECOMMERCE_PROBABILITY:
         return None
     
-    import json
     import uuid
     
     # Generate unique order ID
@@ -695,30 +852,29 @@ def generate_ecommerce_order():
     
     # Determine number of items (weighted toward single items)
     num_items = random.randint(ECOMMERCE_ITEMS_MIN, ECOMMERCE_ITEMS_MAX)
-    weights = [0.6, 0.25, 0.1, 0.04, 0.01]  # Favor 1-2 items
-    if num_items <= len(weights):
-        if random.random() > weights[num_items - 1]:
+    if num_items <= len(_ITEM_COUNT_WEIGHTS):
+        if random.random() > _ITEM_COUNT_WEIGHTS[num_items - 1]:
             num_items = 1
     
+    # Per-item price bounds derived from the configured order value range
+    min_item_price = ECOMMERCE_ORDER_VALUE_MIN / num_items
+    max_item_price = ECOMMERCE_ORDER_VALUE_MAX / num_items
+
     # Select items from different categories
     selected_items = []
-    categories = list(ECOMMERCE_PRODUCTS.keys())
     
-    for _ in range(num_items):
-        category = random.choice(categories)
-        product = random.choice(ECOMMERCE_PRODUCTS[category])
-        
-        # Random quantity (mostly 1, sometimes 2-3)
-        quantity = 1 if random.random() < 0.8 else random.randint(2, 3)
+    for category, product, _ in random.choices(_FLAT_PRODUCTS, cum_weights=_FLAT_PRODUCT_CUM_WEIGHTS, k=num_items):
+        # Random quantity (mostly 1, sometimes 2-3), from a single draw
+        roll = random.random()
+        quantity = 1 if roll < 0.8 else (2 if roll < 0.9 else 3)
         
         # Slight price variation (±5%)
         base_price = product['price']
-        price_variation = random.uniform(0.95, 1.05)
-        final_price = round(base_price * price_variation, 2)
+        price_variation = 0.95 + 0.1 * random.random()
+        final_price = base_price * price_variation
         
         # Ensure price within configured range
-        final_price = max(ECOMMERCE_ORDER_VALUE_MIN / num_items, 
-                         min(final_price, ECOMMERCE_ORDER_VALUE_MAX / num_items))
+        final_price = max(min_item_price, min(final_price, max_item_price))
         
         # Matomo ecommerce item format: [sku, name, category, price, quantity]
         item = [
@@ -730,46 +886,50 @@ def generate_ecommerce_order():
         ]
         selected_items.append(item)
     
-    # Calculate order totals
-    subtotal = sum(item[3] * item[4] for item in selected_items)
+    # Check the order total on raw prices; rounding to cents happens once, below
     shipping = random.choice(ECOMMERCE_SHIPPING_RATES)
-    tax = round((subtotal + shipping) * ECOMMERCE_TAX_RATE, 2)
-    revenue = round(subtotal + shipping + tax, 2)
+    shipping_cents = round(shipping * 100)
+    raw_subtotal = sum(item[3] * item[4] for item in selected_items)
+    raw_revenue = (raw_subtotal + shipping) * (1 + ECOMMERCE_TAX_RATE)
     
     # Ensure total is within configured range
-    if revenue < ECOMMERCE_ORDER_VALUE_MIN or revenue > ECOMMERCE_ORDER_VALUE_MAX:
+    if raw_revenue < ECOMMERCE_ORDER_VALUE_MIN or raw_revenue > ECOMMERCE_ORDER_VALUE_MAX:
         # Scale items proportionally to fit range
         target_subtotal = random.uniform(ECOMMERCE_ORDER_VALUE_MIN * 0.8, 
                                        ECOMMERCE_ORDER_VALUE_MAX * 0.8) - shipping
-        scale_factor = target_subtotal / subtotal
-        
-        for item in selected_items:
-            item[3] = round(item[3] * scale_factor, 2)
-        
-        subtotal = sum(item[3] * item[4] for item in selected_items)
-        tax = round((subtotal + shipping) * ECOMMERCE_TAX_RATE, 2)
-        revenue = round(subtotal + shipping + tax, 2)
+        scale_factor = target_subtotal / raw_subtotal
+        price_cents = [round(item[3] * scale_factor * 100) for item in selected_items]
+    else:
+        price_cents = [round(item[3] * 100) for item in selected_items]
     
-    # Convert items to JSON format for Matomo
-    items_json = json.dumps(selected_items)
+    # Totals are exact integer cents (tax rounded half up); dollars only at the boundary
+    subtotal_cents = sum(cents * item[4] for cents, item in zip(price_cents, selected_items))
+    tax_rate = _exact_rate(ECOMMERCE_TAX_RATE)
+    tax_cents = (
+        2 * (subtotal_cents + shipping_cents) * tax_rate.numerator + tax_rate.denominator
+    ) // (2 * tax_rate.denominator)
+    revenue_cents = subtotal_cents + shipping_cents + tax_cents
+    for item, cents in zip(selected_items, price_cents):
+        item[3] = cents / 100
     
-    return order_id, items_json, revenue, subtotal, tax, shipping
+    return order_id, selected_items, revenue_cents / 100, subtotal_cents / 100, tax_cents / 100, shipping
 
 
-def _generate_funnel_order(step: Dict[str, Any]):
-    """Generate an ecommerce order for a funnel step."""
-    global ECOMMERCE_PROBABILITY
-    original_probability = ECOMMERCE_PROBABILITY
-    try:
-        ECOMMERCE_PROBABILITY = 1.0
-        order = generate_ecommerce_order()
-    finally:
-        ECOMMERCE_PROBABILITY = original_probability
+def encode_ecommerce_items(items) -> str:
+    """Serialize order items to the compact JSON Matomo expects in ec_items.
+
+    Only price and quantity vary per order, so they are appended to the
+    pre-escaped catalog item heads instead of running the JSON encoder.
+    """
+    return '[' + ','.join(
+        f'{_ITEM_JSON_PREFIXES[sku, category]}{price!r},{quantity}]'
+        for sku, _, category, price, quantity in items
+    ) + ']'
 
-    if order is None:
-        raise RuntimeError("Unable to generate ecommerce order for funnel step")
 
-    order_id, items_json, revenue, subtotal, tax, shipping = order
+def _generate_funnel_order(step: Dict[str, Any]):
+    """Generate an ecommerce order for a funnel step."""
+    order_id, items, revenue, subtotal, tax, shipping = generate_ecommerce_order(force=True)
 
     if step.get("ecommerce_revenue") is not None:
         revenue = float(step["ecommerce_revenue"])
@@ -780,10 +940,77 @@ def _generate_funnel_order(step: Dict[str, Any]):
     if step.get("ecommerce_shipping") is not None:
         shipping = float(step["ecommerce_shipping"])
 
-    return order_id, items_json, revenue, subtotal, tax, shipping
+    return order_id, items, revenue, subtotal, tax, shipping
 
 
-async def execute_funnel(session, funnel: Dict[str, Any], urls: List[str], day_range: Optional[tuple] = None) -> bool:
+def _fill_pageview(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    params.setdefault('action_name', f"Funnel: {ctx['funnel_name']} ({ctx['index']+1}/{ctx['n_steps']})")
+    params['pv_id'] = rand_hex(6)
+
+
+def _fill_event(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    params['e_c'] = step['event_category']
+    params['e_a'] = step['event_action']
+    params['e_n'] = step['event_name']
+    if step.get('event_value') is not None:
+        params['e_v'] = step['event_value']
+    params.setdefault('action_name', f"Funnel Event: {step['event_action']}")
+
+
+def _fill_site_search(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    params['search'] = step['search_keyword']
+    if step.get('search_category'):
+        params['search_cat'] = step['search_category']
+    search_results = step.get('search_results')
+    if search_results is None:
+        search_results = random.randint(0, 25)
+    params['search_count'] = int(search_results)
+    params.setdefault('action_name', f"Funnel Search: {step['search_keyword']}")
+
+
+def _fill_outlink(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    page_url = ctx['page_url']
+    target_url = _resolve_link(page_url, step.get('target_url') or page_url)
+    params['link'] = target_url
+    params.setdefault('action_name', f"Funnel Outlink: {target_url}")
+
+
+def _fill_download(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    page_url = ctx['page_url']
+    target_url = _resolve_link(page_url, step.get('target_url') or page_url)
+    params['download'] = target_url
+    params.setdefault('action_name', f"Funnel Download: {target_url.split('/')[-1]}")
+
+
+def _fill_ecommerce(params: Dict[str, Any], step: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    order_id, items, revenue, subtotal, tax, shipping = _generate_funnel_order(step)
+    params.update({
+        'idgoal': '0',
+        'ec_id': order_id,
+        'ec_items': encode_ecommerce_items(items),
+        'revenue': f"{revenue:.2f}",
+        'ec_st': f"{subtotal:.2f}",
+        'ec_tx': f"{tax:.2f}",
+    })
+    params['ec_currency'] = ECOMMERCE_CURRENCY
+    params.setdefault('action_name', f"Funnel Order: {order_id}")
+
+
+# Funnel step type -> handler that adds the step-specific params in place
+_STEP_HANDLERS = MappingProxyType({
+    'pageview': _fill_pageview,
+    'event': _fill_event,
+    'site_search': _fill_site_search,
+    'outlink': _fill_outlink,
+    'download': _fill_download,
+    'ecommerce': _fill_ecommerce,
+})
+
+# Step types that move the visitor to the step's page; outlinks/downloads leave it unchanged
+_PAGE_STEP_TYPES = frozenset({'pageview', 'event', 'site_search', 'ecommerce'})
+
+
+async def execute_funnel(session, funnel: Dict[str, Any], urls: Sequence[str], day_range: Optional[tuple] = None) -> bool:
     """
     Execute a funnel sequence. Returns True if the visit should end after completion.
     """
@@ -791,10 +1018,14 @@ async def execute_funnel(session, funnel: Dict[str, Any], urls: List[str], day_r
     if not steps:
         return True
 
-    logging.info("Executing funnel '%s' (%d steps)", funnel.get("name"), len(steps))
+    # Per-funnel invariants, looked up once rather than on every step
+    funnel_name = funnel.get("name")
+    n_steps = len(steps)
+    logging.info("Executing funnel '%s' (%d steps)", funnel_name, n_steps)
 
     visit_id = rand_hex(16)
     user_agent = random.choice(USER_AGENTS)
+    headers = _UA_HEADERS[user_agent]
     referrer = choose_referrer()
     country, visitor_ip = choose_country_and_ip()
 
@@ -824,30 +1055,29 @@ async def execute_funnel(session, funnel: Dict[str, Any], urls: List[str], day_r
         current_dt = now_dt - timedelta(seconds=total_duration)
     last_page_url: Optional[str] = None
 
+    # Params shared by every step of this funnel visit; each step copies and extends them
+    base_params: Dict[str, Any] = {'_id': visit_id}
+    if visitor_ip:
+        base_params['cip'] = visitor_ip
+    bulk_hits: Optional[List[Dict[str, Any]]] = [] if BULK_TRACKING else None
+    # Per-step context handed to the step handlers; only page_url and index change
+    ctx: Dict[str, Any] = {'funnel_name': funnel_name, 'n_steps': n_steps}
+
     for index, step in enumerate(steps):
         step_type = step.get("type", "pageview")
         delay_after = delays[index]
 
-        page_url = step.get("url") or last_page_url or (random.choice(urls) if urls else MATOMO_URL)
+        page_url = step.get("url") or last_page_url or (urls[int(random.random() * len(urls))] if urls else MATOMO_URL)
         action_name = step.get("action_name")
 
-        params: Dict[str, Any] = {
-            'idsite': SITE_ID,
-            'rec': 1,
-            '_id': visit_id,
-            'rand': random.randint(0, 2**31 - 1),
-            'cdt': format_cdt(current_dt),
-            'url': page_url,
-        }
+        params = base_params.copy()
+        params['rand'] = _RAND31()
+        params['cdt'] = format_cdt(current_dt)
+        params['url'] = page_url
 
         if action_name:
             params['action_name'] = action_name
 
-        if visitor_ip:
-            params['cip'] = visitor_ip
-        if MATOMO_TOKEN_AUTH:
-            params['token_auth'] = MATOMO_TOKEN_AUTH
-
         if index == 0:
             params['new_visit'] = 1
             if referrer:
@@ -855,72 +1085,27 @@ async def execute_funnel(session, funnel: Dict[str, Any], urls: List[str], day_r
         elif last_page_url:
             params['urlref'] = last_page_url
 
-        if step_type == 'pageview':
-            params.setdefault('action_name', f"Funnel: {funnel.get('name')} ({index+1}/{len(steps)})")
-            params['pv_id'] = rand_hex(6)
-            last_page_url = page_url
-
-        elif step_type == 'event':
-            params['e_c'] = step['event_category']
-            params['e_a'] = step['event_action']
-            params['e_n'] = step['event_name']
-            if step.get('event_value') is not None:
-                params['e_v'] = step['event_value']
-            params.setdefault('action_name', f"Funnel Event: {step['event_action']}")
-            last_page_url = page_url
-
-        elif step_type == 'site_search':
-            params['search'] = step['search_keyword']
-            if step.get('search_category'):
-                params['search_cat'] = step['search_category']
-            search_results = step.get('search_results')
-            if search_results is None:
-                search_results = random.randint(0, 25)
-            params['search_count'] = int(search_results)
-            params.setdefault('action_name', f"Funnel Search: {step['search_keyword']}")
-            last_page_url = page_url
-
-        elif step_type == 'outlink':
-            target_url = step.get('target_url') or page_url
-            if not target_url.startswith(('http://', 'https://')):
-                parsed = urllib.parse.urlparse(page_url)
-                base_url = f"{parsed.scheme}://{parsed.netloc}"
-                target_url = urllib.parse.urljoin(base_url, target_url)
-            params['link'] = target_url
-            params.setdefault('action_name', f"Funnel Outlink: {target_url}")
-
-        elif step_type == 'download':
-            target_url = step.get('target_url') or page_url
-            if not target_url.startswith(('http://', 'https://')):
-                parsed = urllib.parse.urlparse(page_url)
-                base_url = f"{parsed.scheme}://{parsed.netloc}"
-                target_url = urllib.parse.urljoin(base_url, target_url)
-            params['download'] = target_url
-            params.setdefault('action_name', f"Funnel Download: {target_url.split('/')[-1]}")
-
-        elif step_type == 'ecommerce':
-            order_id, items_json, revenue, subtotal, tax, shipping = _generate_funnel_order(step)
-            params.update({
-                'idgoal': '0',
-                'ec_id': order_id,
-                'ec_items': items_json,
-                'revenue': f"{revenue:.2f}",
-                'ec_st': f"{subtotal:.2f}",
-                'ec_tx': f"{tax:.2f}",
-            })
-            params['ec_currency'] = ECOMMERCE_CURRENCY
-            params.setdefault('action_name', f"Funnel Order: {order_id}")
-            last_page_url = page_url
-
-        headers = {'User-Agent': user_agent}
+        handler = _STEP_HANDLERS.get(step_type)
+        if handler is not None:
+            ctx['page_url'] = page_url
+            ctx['index'] = index
+            handler(params, step, ctx)
+            if step_type in _PAGE_STEP_TYPES:
+                last_page_url = page_url
 
-        try:
-            await send_hit(session, params, headers)
-        except Exception as exc:  # pragma: no cover - network errors already handled in send_hit
-            logging.error("Error sending funnel step '%s': %s", step_type, exc)
+        if bulk_hits is not None:
+            bulk_hits.append(params)
+        else:
+            try:
+                await send_hit(session, params, headers)
+            except Exception as exc:  # pragma: no cover - network errors already handled in send_hit
+                logging.error("Error sending funnel step '%s': %s", step_type, exc)
 
         current_dt += timedelta(seconds=delay_after)
 
+    if bulk_hits:
+        await send_bulk(session, bulk_hits, headers)
+
     return bool(funnel.get("exit_after_completion", True))
 
 # Logging configuration (can be adjusted with environment variable LOG_LEVEL)
@@ -941,10 +1126,10 @@ def choose_action_pages(num_pvs: int, want_search: bool, want_outlink: bool, wan
     if num_pvs <= 1:
         return -1, -1, -1, -1, -1
 
-    def pick(want: bool):
-        return random.randint(2, num_pvs) if want else -1
-
-    return pick(want_search), pick(want_outlink), pick(want_download), pick(want_click_event), pick(want_random_event)
+    # One draw for all five slots; unwanted actions are masked out afterwards
+    draws = random.choices(range(2, num_pvs + 1), k=5)
+    wants = (want_search, want_outlink, want_download, want_click_event, want_random_event)
+    return tuple(d if w else -1 for d, w in zip(draws, wants))
 
 
 def check_daily_cap(now, day_start, visits_today_local, max_total):
@@ -964,9 +1149,80 @@ def check_daily_cap(now, day_start, visits_today_local, max_total):
         return True, day_start, visits_today_local
     return False, day_start, visits_today_local
 
+
+# Only these values repeat across hits (page URLs, referrers, action names); the rest
+# (cdt, _id, pv_id, ec_id, ec_items, ...) are unique per hit or visit and would only
+# evict them from the cache.
+_CACHED_QUOTE_KEYS = frozenset({'url', 'urlref', 'action_name'})
+
+
+@functools.lru_cache(maxsize=8192)
+def _quote_repeated(value: str) -> str:
+    return urllib.parse.quote(value, safe='')
+
+
+def _quote_value(key: str, value) -> str:
+    if key in _CACHED_QUOTE_KEYS:
+        return _quote_repeated(str(value))
+    return urllib.parse.quote(str(value), safe='')
+
+
+def _encode_params(params) -> str:
+    """urlencode() for hit params: keys are plain identifiers and numbers need no quoting,
+    so only string values are quoted (the repeating ones through a cache)."""
+    return '&'.join([
+        f'{key}={value}' if type(value) is int or type(value) is float else f'{key}={_quote_value(key, value)}'
+        for key, value in params.items()
+    ])
+
+
+def build_tracking_query(params) -> str:
+    """Return the query string for a hit: the pre-encoded base fragment plus per-hit params."""
+    return f"?{_BASE_QS}&{_encode_params(params)}"
+
+
+def build_tracking_url(params) -> str:
+    """Return the tracking URL for a single GET hit."""
+    return MATOMO_URL + build_tracking_query(params)
+
+
+async def _delayed_hit(session, params, headers, delay: float):
+    """Send a hit after `delay` seconds (used by PARALLEL_PVS)."""
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return await send_hit(session, params, headers)
+
+
+@functools.lru_cache(maxsize=16)
+def _action_names(num_pvs: int) -> tuple:
+    """Default pageview action names for a visit of num_pvs pages."""
+    return tuple(f'LoadTest PV {i+1}/{num_pvs}' for i in range(num_pvs))
+
+
 async def send_hit(session, params, headers):
     try:
-        async with session.get(MATOMO_URL, params=params, headers=headers) as resp:
+        # Already percent-encoded; skip yarl's requoting pass
+        url = URL(build_tracking_url(params), encoded=True)
+        async with session.get(url, headers=headers) as resp:
+            # send_image=0 gets an empty 204; hand the connection back without reading a body
+            resp.release()
+            return resp.status
+    except Exception:
+        return None
+
+
+async def send_bulk(session, hits, headers):
+    """POST a visit's hits to Matomo's bulk tracking endpoint in one request.
+
+    Matomo processes the queued requests in order, so a visit's pageviews and
+    ping still land in sequence. Returns the HTTP status or None on error.
+    """
+    payload = {'requests': [build_tracking_query(params) for params in hits]}
+    if MATOMO_TOKEN_AUTH:
+        payload['token_auth'] = MATOMO_TOKEN_AUTH
+    try:
+        async with session.post(MATOMO_URL, json=payload, headers=headers) as resp:
+            # The bulk API answers with a small JSON summary; drain it so the connection is reused
             await resp.read()
             return resp.status
     except Exception:
@@ -985,6 +1241,8 @@ async def visit(session, urls, day_range: Optional[tuple] = None):
     ua = random.choice(USER_AGENTS)
     ref = choose_referrer()  # Choose realistic referrer or None for direct traffic
     country, visitor_ip = choose_country_and_ip()  # Choose country and generate IP
+    headers = _UA_HEADERS[ua]  # The UA is fixed for the whole visit
+    debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
     
     # Determine if this visit will include site search, outlinks, downloads, or custom events
     has_search = random.random() < SITESEARCH_PROBABILITY
@@ -1013,7 +1271,8 @@ async def visit(session, urls, day_range: Optional[tuple] = None):
     # Split visit duration across each pageview as dwell time segments.
     # There are num_pvs segments: one before each subsequent PV, and one final segment after the last PV.
     # Use random weights to create natural variation across pages.
-    weights = [random.uniform(0.5, 1.5) for _ in range(num_pvs)]
+    rand = random.random
+    weights = [0.5 + rand() for _ in range(num_pvs)]  # uniform(0.5, 1.5) without the wrapper call
     total_weight = sum(weights)
     dwell_times = [(visit_duration_seconds * w / total_weight) for w in weights]
 
@@ -1044,152 +1303,156 @@ async def visit(session, urls, day_range: Optional[tuple] = None):
 
     pv_ids = [rand_hex(6) for _ in range(num_pvs)]
 
-    for i in range(num_pvs):
-        url = random.choice(urls)
-        # Keep the original page URL (the page that contains any outlink/download)
-        page_url = url
-
-        # Use the simulated timeline timestamp for this pageview (converted to UTC for Matomo)
-        timestamp = format_cdt(pv_times[i])
-
-        params = {
-            'idsite': SITE_ID,
-            'rec': 1,
-            'url': page_url,
-            'action_name': f'LoadTest PV {i+1}/{num_pvs}',
-            '_id': vid,
-            'rand': random.randint(0, 2**31-1),
-            'cdt': timestamp,
-        }
-
-        # Include a stable pageview id so we can later send a ping to extend the last page's time
-        params['pv_id'] = pv_ids[i]
-        
-        # Add visitor IP for geolocation if enabled
-        if visitor_ip:
-            params['cip'] = visitor_ip
-        # Include token_auth whenever provided so Matomo accepts overridden cdt/cip
-        if MATOMO_TOKEN_AUTH:
-            params['token_auth'] = MATOMO_TOKEN_AUTH
-
-        # If this is not the first pageview, include referrer as the previous page
-        # so Matomo can attribute outlinks/downloads correctly.
-        if i == 0:
-            params['new_visit'] = 1
-            # Only set referrer if it's not None (direct traffic has no referrer)
-            if ref is not None:
-                params['urlref'] = ref
-        else:
-            params['urlref'] = last_page_url
+    # Params shared by every hit of this visit; each hit copies and extends them
+    base_params = {'_id': vid}
+    # Add visitor IP for geolocation if enabled
+    if visitor_ip:
+        base_params['cip'] = visitor_ip
+    # With bulk tracking the hits are collected here and sent together after the ping
+    bulk_hits = [] if BULK_TRACKING else None
+    # With PARALLEL_PVS each pageview is sent by its own task after a cumulative delay.
+    # The group is scoped to the pageview loop: leaving it waits for every hit (so the
+    # ping still follows the last page and the visit keeps its slot), and cancelling
+    # the visit cancels the pending hits.
+    pv_group = asyncio.TaskGroup() if PARALLEL_PVS and bulk_hits is None else None
+    hit_delay = 0.0
+
+    # Draw every page of the visit in one call
+    page_urls = random.choices(urls, k=num_pvs)
+    action_names = _action_names(num_pvs)
+
+    async with pv_group or contextlib.nullcontext():
+        for i in range(num_pvs):
+            # Keep the original page URL (the page that contains any outlink/download)
+            page_url = page_urls[i]
+
+            # Use the simulated timeline timestamp for this pageview (converted to UTC for Matomo)
+            timestamp = format_cdt(pv_times[i])
+
+            params = base_params.copy()
+            params['url'] = page_url
+            params['action_name'] = action_names[i]
+            params['rand'] = _RAND31()
+            params['cdt'] = timestamp
+            # Include a stable pageview id so we can later send a ping to extend the last page's time
+            params['pv_id'] = pv_ids[i]
+
+            # If this is not the first pageview, include referrer as the previous page
+            # so Matomo can attribute outlinks/downloads correctly.
+            if i == 0:
+                params['new_visit'] = 1
+                # Only set referrer if it's not None (direct traffic has no referrer)
+                if ref is not None:
+                    params['urlref'] = ref
+            else:
+                params['urlref'] = last_page_url
 
-        # Add site search parameters if this is the search pageview
-        if i + 1 == search_pageview:
-            search_keyword = random.choice(SEARCH_TERMS)
-            search_category = random.choice(['', 'Products', 'Support', 'Documentation']) if random.random() < 0.3 else ''
-            search_count = random.randint(0, 25)  # Number of search results
+            # Add site search parameters if this is the search pageview
+            if i + 1 == search_pageview:
+                search_keyword = random.choice(SEARCH_TERMS)
+                search_category = random.choice(['', 'Products', 'Support', 'Documentation']) if random.random() < 0.3 else ''
+                search_count = random.randint(0, 25)  # Number of search results
             
-            params['search'] = search_keyword
-            if search_category:
-                params['search_cat'] = search_category
-            params['search_count'] = search_count
-            params['action_name'] = f'Search: {search_keyword}'
+                params['search'] = search_keyword
+                if search_category:
+                    params['search_cat'] = search_category
+                params['search_count'] = search_count
+                params['action_name'] = f'Search: {search_keyword}'
         
-        # Add outlink tracking if this is the outlink pageview
-        elif i + 1 == outlink_pageview:
-            outlink_url = random.choice(OUTLINKS)
-            # Set the clicked link; keep params['url'] as the page URL where the link was clicked
-            params['link'] = outlink_url
-            params['action_name'] = f'Outlink: {outlink_url}'
+            # Add outlink tracking if this is the outlink pageview
+            elif i + 1 == outlink_pageview:
+                outlink_url = random.choice(OUTLINKS)
+                # Set the clicked link; keep params['url'] as the page URL where the link was clicked
+                params['link'] = outlink_url
+                params['action_name'] = f'Outlink: {outlink_url}'
         
-        # Add download tracking if this is the download pageview
-        elif i + 1 == download_pageview:
-            download_file = random.choice(DOWNLOADS)
-            # If DOWNLOADS items are paths, convert to a full URL using the current page as base
-            if download_file.startswith('http://') or download_file.startswith('https://'):
-                download_url = download_file
-            else:
-                parsed = urllib.parse.urlparse(page_url)
-                base_url = f"{parsed.scheme}://{parsed.netloc}"
-                download_url = urllib.parse.urljoin(base_url, download_file)
-
-            # Set download parameter; keep params['url'] as the page URL where the download was initiated
-            params['download'] = download_url
-            params['action_name'] = f'Download: {download_url.split("/")[-1]}'
+            # Add download tracking if this is the download pageview
+            elif i + 1 == download_pageview:
+                download_file = random.choice(DOWNLOADS)
+                # If DOWNLOADS items are paths, convert to a full URL using the current page as base
+                download_url = _resolve_link(page_url, download_file)
+
+                # Set download parameter; keep params['url'] as the page URL where the download was initiated
+                params['download'] = download_url
+                params['action_name'] = f'Download: {download_url.split("/")[-1]}'
         
-        # Add click event tracking if this is the click event pageview
-        elif i + 1 == click_event_pageview:
-            click_event = random.choice(CLICK_EVENTS)
-            params['e_c'] = click_event['category']
-            params['e_a'] = click_event['action']
-            params['e_n'] = click_event['name']
-            if click_event['value'] is not None:
-                params['e_v'] = click_event['value']
-            params['action_name'] = f'Event: {click_event["action"]} - {click_event["name"]}'
+            # Add click event tracking if this is the click event pageview
+            elif i + 1 == click_event_pageview:
+                click_event = random.choice(CLICK_EVENTS)
+                params['e_c'] = click_event['category']
+                params['e_a'] = click_event['action']
+                params['e_n'] = click_event['name']
+                if click_event['value'] is not None:
+                    params['e_v'] = click_event['value']
+                params['action_name'] = f'Event: {click_event["action"]} - {click_event["name"]}'
         
-        # Add random event tracking if this is the random event pageview
-        elif i + 1 == random_event_pageview:
-            random_event = random.choice(RANDOM_EVENTS)
-            params['e_c'] = random_event['category']
-            params['e_a'] = random_event['action']
-            params['e_n'] = random_event['name']
-            if random_event['value'] is not None:
-                params['e_v'] = random_event['value']
-            params['action_name'] = f'Event: {random_event["action"]} - {random_event["name"]}'
+            # Add random event tracking if this is the random event pageview
+            elif i + 1 == random_event_pageview:
+                random_event = random.choice(RANDOM_EVENTS)
+                params['e_c'] = random_event['category']
+                params['e_a'] = random_event['action']
+                params['e_n'] = random_event['name']
+                if random_event['value'] is not None:
+                    params['e_v'] = random_event['value']
+                params['action_name'] = f'Event: {random_event["action"]} - {random_event["name"]}'
         
-        # Add ecommerce order tracking if this is the ecommerce pageview
-        elif i + 1 == ecommerce_pageview and ecommerce_order:
-            order_id, items_json, revenue, subtotal, tax, shipping = ecommerce_order
-            params['idgoal'] = '0'  # Required for ecommerce orders
-            params['ec_id'] = order_id
-            params['ec_items'] = items_json
-            params['revenue'] = str(revenue)
-            params['ec_st'] = str(subtotal)
-            params['ec_tx'] = str(tax)
-            params['ec_currency'] = ECOMMERCE_CURRENCY
-            params['action_name'] = f'Ecommerce Order: {order_id} ({ECOMMERCE_CURRENCY} {revenue})'
-        # Update last_page_url so the next pageview can use it as urlref
-        # For outlink/download we keep last_page_url as the original page containing the link
-        # so subsequent pageviews still show a sensible referrer.
-        # (last_page_url is used at the top of the loop for non-first PVs)
-
-        headers = {'User-Agent': ua}
-
-        # Build a debug-friendly request string for logging
-        try:
-            request_qs = urllib.parse.urlencode(params)
-        except Exception:
-            request_qs = str(params)
-        request_url = f"{MATOMO_URL}?{request_qs}"
-
-        # Log only the outlink/download/event/ecommerce hits at INFO level to avoid noise
-        if 'download' in params:
-            logging.info('Sending download hit: visitor=%s file=%s referer=%s', vid, params.get('download'), params.get('urlref'))
-            logging.debug('Matomo request: %s', request_url)
-        elif 'link' in params:
-            logging.info('Sending outlink hit: visitor=%s link=%s referer=%s', vid, params.get('link'), params.get('urlref'))
-            logging.debug('Matomo request: %s', request_url)
-        elif 'e_c' in params:
-            logging.info('Sending custom event: visitor=%s category=%s action=%s name=%s value=%s', vid, params.get('e_c'), params.get('e_a'), params.get('e_n'), params.get('e_v', 'None'))
-            logging.debug('Matomo request: %s', request_url)
-        elif 'ec_id' in params:
-            logging.info('Sending ecommerce order: visitor=%s order=%s revenue=%s items=%s', vid, params.get('ec_id'), params.get('revenue'), len(eval(params.get('ec_items', '[]'))))
-            logging.debug('Matomo request: %s', request_url)
-        else:
-            logging.debug('Sending pageview: visitor=%s action=%s', vid, params.get('action_name'))
+            # Add ecommerce order tracking if this is the ecommerce pageview
+            elif i + 1 == ecommerce_pageview and ecommerce_order:
+                order_id, items, revenue, subtotal, tax, shipping = ecommerce_order
+                params['idgoal'] = '0'  # Required for ecommerce orders
+                params['ec_id'] = order_id
+                params['ec_items'] = encode_ecommerce_items(items)
+                params['revenue'] = str(revenue)
+                params['ec_st'] = str(subtotal)
+                params['ec_tx'] = str(tax)
+                params['ec_currency'] = ECOMMERCE_CURRENCY
+                params['action_name'] = f'Ecommerce Order: {order_id} ({ECOMMERCE_CURRENCY} {revenue})'
+            # Update last_page_url so the next pageview can use it as urlref
+            # For outlink/download we keep last_page_url as the original page containing the link
+            # so subsequent pageviews still show a sensible referrer.
+            # (last_page_url is used at the top of the loop for non-first PVs)
+
+            # Build a debug-friendly request string only when DEBUG output is enabled
+            request_url = build_tracking_url(params) if debug_enabled else None
+
+            # Log only the outlink/download/event/ecommerce hits at INFO level to avoid noise
+            if 'download' in params:
+                logging.info('Sending download hit: visitor=%s file=%s referer=%s', vid, params.get('download'), params.get('urlref'))
+                logging.debug('Matomo request: %s', request_url)
+            elif 'link' in params:
+                logging.info('Sending outlink hit: visitor=%s link=%s referer=%s', vid, params.get('link'), params.get('urlref'))
+                logging.debug('Matomo request: %s', request_url)
+            elif 'e_c' in params:
+                logging.info('Sending custom event: visitor=%s category=%s action=%s name=%s value=%s', vid, params.get('e_c'), params.get('e_a'), params.get('e_n'), params.get('e_v', 'None'))
+                logging.debug('Matomo request: %s', request_url)
+            elif 'ec_id' in params:
+                logging.info('Sending ecommerce order: visitor=%s order=%s revenue=%s items=%s', vid, params.get('ec_id'), params.get('revenue'), len(ecommerce_order[1]))
+                logging.debug('Matomo request: %s', request_url)
+            else:
+                logging.debug('Sending pageview: visitor=%s action=%s', vid, params.get('action_name'))
 
-        await send_hit(session, params, headers)
+            if bulk_hits is not None:
+                bulk_hits.append(params)
+            elif pv_group is not None:
+                pv_group.create_task(_delayed_hit(session, params, headers, hit_delay))
+            else:
+                await send_hit(session, params, headers)
         
-        # Set last_page_url for next iteration
-        if i + 1 == outlink_pageview or i + 1 == download_pageview:
-            # user clicked away; keep last_page_url as the page that contained the link
-            last_page_url = page_url
-        else:
-            # for custom events and regular pageviews, use the current page URL
-            last_page_url = page_url
+            # Set last_page_url for next iteration
+            if i + 1 == outlink_pageview or i + 1 == download_pageview:
+                # user clicked away; keep last_page_url as the page that contained the link
+                last_page_url = page_url
+            else:
+                # for custom events and regular pageviews, use the current page URL
+                last_page_url = page_url
             
-        if i < num_pvs - 1:
-            # Keep a short real delay to smooth outbound requests (cdt handles the simulated timing)
-            await asyncio.sleep(random.uniform(PAUSE_BETWEEN_PVS_MIN, PAUSE_BETWEEN_PVS_MAX))
+            if i < num_pvs - 1 and bulk_hits is None:
+                # Keep a short real delay to smooth outbound requests (cdt handles the simulated timing)
+                pause = random.uniform(PAUSE_BETWEEN_PVS_MIN, PAUSE_BETWEEN_PVS_MAX)
+                if pv_group is not None:
+                    hit_delay += pause
+                else:
+                    await asyncio.sleep(pause)
     
     # Extend the last page's time-on-page using a ping hit
     try:
@@ -1197,27 +1460,24 @@ async def visit(session, urls, day_range: Optional[tuple] = None):
         last_pv_id = pv_ids[-1]
         last_page_timestamp = format_cdt(last_pv_time + timedelta(seconds=dwell_times[-1]))
 
-        ping_params = {
-            'idsite': SITE_ID,
-            'rec': 1,
-            'url': last_page_url,
-            '_id': vid,
-            'cdt': last_page_timestamp,
-            'ping': 1,
-            'pv_id': last_pv_id,
-        }
-        if visitor_ip:
-            ping_params['cip'] = visitor_ip
-        if MATOMO_TOKEN_AUTH:
-            ping_params['token_auth'] = MATOMO_TOKEN_AUTH
-
-        headers = {'User-Agent': ua}
+        ping_params = base_params.copy()
+        ping_params['url'] = last_page_url
+        ping_params['cdt'] = last_page_timestamp
+        ping_params['ping'] = 1
+        ping_params['pv_id'] = last_pv_id
+
         logging.debug('Sending ping to extend last page time: visitor=%s pv_id=%s', vid, last_pv_id)
-        await send_hit(session, ping_params, headers)
+        if bulk_hits is not None:
+            bulk_hits.append(ping_params)
+        else:
+            await send_hit(session, ping_params, headers)
     except Exception:
         # Best-effort; if ping fails, the last page time may appear shorter (0s)
         pass
 
+    if bulk_hits:
+        await send_bulk(session, bulk_hits, headers)
+
 class GracefulExit(SystemExit):
     pass
 
@@ -1225,147 +1485,174 @@ def _handle_sig(*_):
     raise GracefulExit()
 
 
+class _TokenBucket:
+    """Token bucket for visit starts: once started, a loop timer grants tokens at
+    `rate` per second, banking at most `burst`; dispatchers block in acquire()
+    until one is available."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = asyncio.Semaphore(0)
+        self._banked = 0
+        self._owed = 0.0
+        self._last = 0.0
+        self._interval = 0.0
+        self._loop = None
+        self._handle = None
+
+    async def acquire(self) -> None:
+        await self._tokens.acquire()
+        self._banked -= 1
+
+    def start(self) -> None:
+        if self.rate <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        # One timer per token at low rates, but batch grants above ~100/s
+        self._interval = max(1.0 / self.rate, 0.01)
+        self._last = self._loop.time()
+        self._handle = self._loop.call_at(self._last + self._interval, self._tick)
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _tick(self) -> None:
+        # Credit the time actually elapsed, so a late timer never loses tokens
+        now = self._loop.time()
+        self._owed += (now - self._last) * self.rate
+        self._last = now
+        whole = int(self._owed)
+        self._owed -= whole
+        for _ in range(min(whole, self.burst - self._banked)):
+            self._banked += 1
+            self._tokens.release()
+        self._handle = self._loop.call_at(now + self._interval, self._tick)
+
+
 async def run_realtime(session, urls):
     """Realtime load generation loop (existing behavior)."""
-    visits_per_sec = TARGET_VISITS_PER_DAY / 86400.0
-    tokens = 0.0
-    last = time.time()
+    bucket = _TokenBucket(TARGET_VISITS_PER_DAY / 86400.0, CONCURRENCY)
 
-    q = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    # Each visit runs as its own task; the semaphore caps how many are in flight
+    slots = asyncio.Semaphore(CONCURRENCY)
+    in_flight = set()
 
-    start_ts = time.time()
+    start_ts = time.monotonic()
+    # Only the dispatcher writes visits_total (visits started); today's count is
+    # derived from the total at window start
     visits_total = 0
-    visits_today = 0
     day_window_start = start_ts
+    day_window_base = 0
+
+    async def run_visit():
+        try:
+            await visit(session, urls)
+        except Exception:
+            pass
+        finally:
+            slots.release()
+
+    # Set by the watchdog (time limit) or the dispatcher (visit limit)
+    stop_event = asyncio.Event()
 
-    async def producer():
-        nonlocal tokens, last, visits_today
+    async def watchdog():
+        deadline = start_ts + AUTO_STOP_AFTER_HOURS * 3600 if AUTO_STOP_AFTER_HOURS > 0 else None
+        last_log = start_ts
         while True:
-            if AUTO_STOP_AFTER_HOURS > 0 and (time.time() - start_ts) >= AUTO_STOP_AFTER_HOURS * 3600:
-                await q.put(None)
-                await asyncio.sleep(0.1)
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
                 break
+            if now - last_log >= 60:
+                print(f"[loadgen] visits_total={visits_total}")
+                last_log = now
+        stop_event.set()
 
-            now = time.time()
-            dt = now - last
-            last = now
-            tokens += visits_per_sec * dt
-            if tokens > CONCURRENCY:
-                tokens = CONCURRENCY
+    async def dispatcher():
+        nonlocal visits_total, day_window_start, day_window_base
+        while not stop_event.is_set():
+            await bucket.acquire()
+            now = time.monotonic()
 
             if MAX_TOTAL_VISITS > 0:
-                should_pause, new_day_start, new_visits_today = check_daily_cap(now, day_window_start, visits_today, MAX_TOTAL_VISITS)
-                day_window_start = new_day_start
-                visits_today = new_visits_today
+                visits_today = visits_total - day_window_base
+                should_pause, new_day_start, _ = check_daily_cap(now, day_window_start, visits_today, MAX_TOTAL_VISITS)
+                if new_day_start != day_window_start:
+                    # Window rolled over; today's count restarts from the current total
+                    day_window_start = new_day_start
+                    day_window_base = visits_total
                 if should_pause:
                     logging.info('[loadgen] daily cap reached (%d). Pausing until window resets.', MAX_TOTAL_VISITS)
                     await asyncio.sleep(5)
                     continue
 
-            while tokens >= 1 and not q.full():
-                await q.put(1)
-                tokens -= 1
-
-            await asyncio.sleep(0.25)
-
-    async def worker():
-        nonlocal visits_total, visits_today
-        while True:
-            job = await q.get()
-            if job is None:
-                q.task_done()
-                break
-            try:
-                await visit(session, urls)
-            except Exception:
-                pass
-            finally:
-                visits_total += 1
-                visits_today += 1
-                q.task_done()
-
-    workers = [asyncio.create_task(worker()) for _ in range(CONCURRENCY)]
-    prod = asyncio.create_task(producer())
+            await slots.acquire()
+            task = tg.create_task(run_visit())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            visits_total += 1
 
-    last_log = time.time()
-    try:
-        while True:
-            await asyncio.sleep(10)
-            if AUTO_STOP_AFTER_HOURS > 0 and (time.time() - start_ts) >= AUTO_STOP_AFTER_HOURS * 3600:
-                break
             if MAX_TOTAL_VISITS > 0 and visits_total >= MAX_TOTAL_VISITS:
-                break
-
-            now = time.time()
-            if now - last_log >= 60:
-                print(f"[loadgen] visits_total={visits_total}")
-                last_log = now
-    except GracefulExit:
-        print("[loadgen] Shutting down...")
-    finally:
-        prod.cancel()
-        for w in workers:
-            w.cancel()
-        await asyncio.gather(*workers, return_exceptions=True)
-        await asyncio.gather(prod, return_exceptions=True)
-
-    elapsed = time.time() - start_ts
+                # Every visit has been started: let the in-flight ones finish, then stop
+                if in_flight:
+                    await asyncio.wait(list(in_flight))
+                stop_event.set()
+                return
+
+    # TaskGroup awaits every task on exit; cancelled visits are not treated as errors.
+    bucket.start()
+    async with asyncio.TaskGroup() as tg:
+        disp = tg.create_task(dispatcher())
+        dog = tg.create_task(watchdog())
+        try:
+            await stop_event.wait()
+        except GracefulExit:
+            print("[loadgen] Shutting down...")
+        finally:
+            bucket.stop()
+            disp.cancel()
+            dog.cancel()
+            for task in list(in_flight):
+                task.cancel()
+
+    elapsed = time.monotonic() - start_ts
     rate = visits_total / elapsed if elapsed > 0 else 0.0
     print(f"[loadgen] Done. Sent {visits_total} visits in {elapsed:.1f}s (~{rate*86400:.0f}/day).")
 
 
 async def run_backfill_day(session, urls, day_range: tuple, visits_target: int, rps_limit: Optional[float]):
     """Run backfill for a single day window."""
-    tokens = 0.0
-    last = time.time()
     rate_limit = rps_limit if rps_limit else TARGET_VISITS_PER_DAY / 86400.0
+    bucket = _TokenBucket(rate_limit, CONCURRENCY)
 
-    q = asyncio.Queue(maxsize=CONCURRENCY * 2)
+    # Each visit runs as its own task; the semaphore caps how many are in flight
+    slots = asyncio.Semaphore(CONCURRENCY)
+    # Counted by the dispatch loop below, its only writer
     visits_total = 0
-    visits_scheduled = 0
-
-    async def producer():
-        nonlocal tokens, last, visits_scheduled
-        while visits_scheduled < visits_target:
-            now = time.time()
-            dt = now - last
-            last = now
-            tokens += rate_limit * dt
-            if tokens > CONCURRENCY:
-                tokens = CONCURRENCY
-
-            while tokens >= 1 and not q.full() and visits_scheduled < visits_target:
-                await q.put(1)
-                tokens -= 1
-                visits_scheduled += 1
-
-            await asyncio.sleep(0.2)
-
-        for _ in range(CONCURRENCY):
-            await q.put(None)
-
-    async def worker():
-        nonlocal visits_total
-        while True:
-            job = await q.get()
-            if job is None:
-                q.task_done()
-                break
-            try:
-                await visit(session, urls, day_range)
-            except Exception:
-                pass
-            finally:
-                visits_total += 1
-                q.task_done()
 
-    workers = [asyncio.create_task(worker()) for _ in range(CONCURRENCY)]
-    prod = asyncio.create_task(producer())
-    try:
-        await asyncio.gather(*workers)
-    finally:
-        prod.cancel()
-        await asyncio.gather(prod, return_exceptions=True)
+    async def run_visit():
+        try:
+            await visit(session, urls, day_range)
+        except Exception:
+            pass
+        finally:
+            slots.release()
+
+    # Schedule every visit inside the group so it exits only once the last
+    # in-flight visit has finished.
+    bucket.start()
+    async with asyncio.TaskGroup() as tg:
+        try:
+            for _ in range(visits_target):
+                await bucket.acquire()
+                await slots.acquire()
+                tg.create_task(run_visit())
+                visits_total += 1
+        finally:
+            bucket.stop()
 
     return visits_total
 
@@ -1416,30 +1703,67 @@ async def _idle_after_backfill():
     while True:
         await asyncio.sleep(3600)
 
+def _consume_start_signal() -> bool:
+    """Remove START_SIGNAL_FILE if present; return True when it was found."""
+    if not os.path.exists(START_SIGNAL_FILE):
+        return False
+    try:
+        os.remove(START_SIGNAL_FILE)
+    except OSError:
+        pass
+    logging.info("[startup] Start signal detected; beginning load generation.")
+    return True
+
+
 async def wait_for_start_signal():
     """Block startup when AUTO_START is disabled until a start signal file appears."""
     if AUTO_START:
         return
 
     logging.info("[startup] AUTO_START disabled; waiting for start signal file at %s", START_SIGNAL_FILE)
+    if _consume_start_signal():
+        return
+
+    watch_dir = os.path.dirname(START_SIGNAL_FILE) or "."
+    if awatch is not None and os.path.isdir(watch_dir):
+        # Wake on filesystem events; the timeout still re-checks every interval in
+        # case the file appeared before the watch was set up.
+        async for _changes in awatch(
+            watch_dir,
+            debounce=50,
+            recursive=False,
+            rust_timeout=max(1, int(START_CHECK_INTERVAL * 1000)),
+            yield_on_timeout=True,
+        ):
+            if _consume_start_signal():
+                return
+
     while True:
-        if os.path.exists(START_SIGNAL_FILE):
-            try:
-                os.remove(START_SIGNAL_FILE)
-            except OSError:
-                pass
-            logging.info("[startup] Start signal detected; beginning load generation.")
-            return
         await asyncio.sleep(START_CHECK_INTERVAL)
+        if _consume_start_signal():
+            return
 
 async def main():
     await wait_for_start_signal()
     urls_file = resolve_urls_file()
     urls = read_urls(urls_file)
 
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=False)
+    pool_limit = CONNECTOR_LIMIT if CONNECTOR_LIMIT > 0 else max(CONCURRENCY * 4, 200)
+    # Keep idle tracker connections around between a visit's paced hits
+    connector = aiohttp.TCPConnector(
+        limit=pool_limit,
+        limit_per_host=min(pool_limit, max(CONCURRENCY * 2, 100)),
+        ssl=False,
+        keepalive_timeout=75,
+        ttl_dns_cache=300,
+    )
     timeout = aiohttp.ClientTimeout(total=None)
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+    # Tracker responses are empty, so don't negotiate gzip on every request
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        skip_auto_headers=('Accept-Encoding',),
+    ) as session:
         if BACKFILL_ENABLED:
             await run_backfill(session, urls)
             if BACKFILL_RUN_ONCE:
@@ -1450,4 +1774,5 @@ async def main():
 if __name__ == "__main__":
     for sig in (signal.SIGINT, signal.SIGTERM):
         signal.signal(sig, _handle_sig)
-    asyncio.run(main())
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+        runner.run(main())
@@ -0,0 +1,40 @@
+"""Shared loader.py loading for the test suite.
+
+Tests need an isolated copy of the loader module (fresh globals) per test, but
+recompiling the file every time is wasted work: compile it once per session
+and execute the cached code object into a new module instead.
+"""
+import functools
+import os
+import pathlib
+import types
+import uuid
+
+HERE = pathlib.Path(__file__).resolve().parents[1]
+LOADER_PATH = HERE / "loader.py"
+
+
+@functools.lru_cache(maxsize=1)
+def _loader_code():
+    return compile(LOADER_PATH.read_bytes(), str(LOADER_PATH), "exec")
+
+
+def load_fresh_loader(env_overrides=None, prefix="loader_for_test"):
+    """Execute loader.py into a new module, with optional environment overrides."""
+    module = types.ModuleType(f"{prefix}_{uuid.uuid4().hex}")
+    module.__file__ = str(LOADER_PATH)
+
+    env_overrides = env_overrides or {}
+    original_env = {key: os.environ.get(key) for key in env_overrides}
+    try:
+        for key, value in env_overrides.items():
+            os.environ[key] = str(value)
+        exec(_loader_code(), module.__dict__)
+    finally:
+        for key, value in original_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    return module
@@ -1,18 +1,18 @@
 import asyncio
 from pathlib import Path
 
-from test_backfill import load_loader
+from conftest import load_fresh_loader
 
 
 def test_wait_for_start_signal_skips_when_enabled(monkeypatch):
-    loader = load_loader()
+    loader = load_fresh_loader()
     monkeypatch.setattr(loader, "AUTO_START", True)
     asyncio.run(asyncio.wait_for(loader.wait_for_start_signal(), timeout=0.1))
 
 
 def test_wait_for_start_signal_blocks_until_file(tmp_path: Path, monkeypatch):
     signal_path = tmp_path / "loadgen.start"
-    loader = load_loader()
+    loader = load_fresh_loader()
     monkeypatch.setattr(loader, "AUTO_START", False)
     monkeypatch.setattr(loader, "START_SIGNAL_FILE", str(signal_path))
     monkeypatch.setattr(loader, "START_CHECK_INTERVAL", 0.01)
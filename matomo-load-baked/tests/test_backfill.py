@@ -1,28 +1,13 @@
 import asyncio
-import importlib.util
-import pathlib
-import sys
-import uuid
 from datetime import date, timedelta
 
 import pytest
 
-HERE = pathlib.Path(__file__).resolve().parents[1]
-LOADER_PATH = str(HERE / "loader.py")
-
-
-def load_loader():
-    """Load a fresh copy of loader.py to avoid shared globals across tests."""
-    module_name = f"loader_for_backfill_{uuid.uuid4().hex}"
-    spec = importlib.util.spec_from_file_location(module_name, LOADER_PATH)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)  # type: ignore[attr-defined]
-    sys.modules.pop(module_name, None)
-    return module
+from conftest import load_fresh_loader
 
 
 def test_compute_backfill_window_absolute():
-    loader = load_loader()
+    loader = load_fresh_loader()
     loader.BACKFILL_START_DATE = "2024-10-01"
     loader.BACKFILL_END_DATE = "2024-10-03"
     loader.BACKFILL_DAYS_BACK = None
@@ -36,7 +21,7 @@ def test_compute_backfill_window_absolute():
 
 
 def test_compute_backfill_window_rejects_future_end():
-    loader = load_loader()
+    loader = load_fresh_loader()
     today = date.today()
     tomorrow = today + timedelta(days=1)
     loader.BACKFILL_START_DATE = today.strftime("%Y-%m-%d")
@@ -50,7 +35,7 @@ def test_compute_backfill_window_rejects_future_end():
 
 
 def test_compute_backfill_window_rejects_long_window():
-    loader = load_loader()
+    loader = load_fresh_loader()
     today = date.today()
     too_far = today - timedelta(days=181)
     loader.BACKFILL_START_DATE = too_far.strftime("%Y-%m-%d")
@@ -64,7 +49,7 @@ def test_compute_backfill_window_rejects_long_window():
 
 
 def test_run_backfill_respects_caps_and_seed(monkeypatch):
-    loader = load_loader()
+    loader = load_fresh_loader()
     loader.BACKFILL_START_DATE = "2024-10-01"
     loader.BACKFILL_END_DATE = "2024-10-02"  # two days
     loader.BACKFILL_DAYS_BACK = None
@@ -96,7 +81,7 @@ def test_format_cdt_converts_to_utc():
     import pytz
     from datetime import datetime
     
-    loader = load_loader()
+    loader = load_fresh_loader()
     
     # Test with CET timezone (UTC+1 in winter)
     cet = pytz.timezone('CET')
@@ -116,3 +101,42 @@ def test_format_cdt_converts_to_utc():
     utc_dt = pytz.UTC.localize(datetime(2025, 12, 1, 10, 0, 0))
     result_utc = loader.format_cdt(utc_dt)
     assert result_utc == "2025-12-01 10:00:00"
+
+
+def test_run_backfill_day_dispatches_target_visits(monkeypatch):
+    loader = load_fresh_loader()
+    monkeypatch.setattr(loader, "CONCURRENCY", 4)
+
+    calls = []
+
+    async def fake_visit(session, urls, day_range=None):
+        calls.append(day_range)
+
+    monkeypatch.setattr(loader, "visit", fake_visit)
+    sent = asyncio.run(
+        asyncio.wait_for(
+            loader.run_backfill_day(None, ["https://example.com"], ("start", "end"), 6, 1000.0),
+            timeout=5,
+        )
+    )
+
+    assert sent == 6
+    assert len(calls) == 6
+    assert all(day_range == ("start", "end") for day_range in calls)
+
+
+def test_run_realtime_stops_at_max_total_visits(monkeypatch):
+    loader = load_fresh_loader()
+    monkeypatch.setattr(loader, "CONCURRENCY", 2)
+    monkeypatch.setattr(loader, "MAX_TOTAL_VISITS", 3)
+    monkeypatch.setattr(loader, "TARGET_VISITS_PER_DAY", 86400 * 100)
+
+    calls = []
+
+    async def fake_visit(session, urls, day_range=None):
+        calls.append(day_range)
+
+    monkeypatch.setattr(loader, "visit", fake_visit)
+    asyncio.run(asyncio.wait_for(loader.run_realtime(None, ["https://example.com"]), timeout=5))
+
+    assert len(calls) == 3
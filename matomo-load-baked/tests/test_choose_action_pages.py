@@ -1,23 +1,9 @@
-import importlib.util
-import pathlib
 import random
-import sys
-import uuid
 
-HERE = pathlib.Path(__file__).resolve().parents[1]
-LOADER_PATH = str(HERE / "loader.py")
+from conftest import load_fresh_loader
 
 
-def load_loader():
-    module_name = f"loader_for_actions_{uuid.uuid4().hex}"
-    spec = importlib.util.spec_from_file_location(module_name, LOADER_PATH)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)  # type: ignore[attr-defined]
-    sys.modules.pop(module_name, None)
-    return module
-
-
-loader = load_loader()
+loader = load_fresh_loader()
 choose_action_pages = loader.choose_action_pages
 
 
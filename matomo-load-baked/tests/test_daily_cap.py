@@ -1,15 +1,9 @@
 import time
-import importlib.util
-import pathlib
 
-# Load the loader module directly from its file path because the package
-# directory contains a hyphen and isn't importable as a normal module.
-HERE = pathlib.Path(__file__).resolve().parents[1]
-LOADER_PATH = str(HERE / 'loader.py')
+from conftest import load_fresh_loader
 
-spec = importlib.util.spec_from_file_location('loader', LOADER_PATH)
-loader = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(loader)
+
+loader = load_fresh_loader()
 
 
 def test_check_daily_cap_disabled():
@@ -1,41 +1,12 @@
-import importlib.util
 import json
-import os
-import pathlib
 import random
-import sys
-import uuid
+from decimal import ROUND_HALF_UP, Decimal
 
-import pytest
-
-HERE = pathlib.Path(__file__).resolve().parents[1]
-LOADER_PATH = str(HERE / "loader.py")
-
-
-def load_loader_module(env_overrides):
-    """Load loader.py with specific environment overrides."""
-    module_name = f"loader_for_test_{uuid.uuid4().hex}"
-    spec = importlib.util.spec_from_file_location(module_name, LOADER_PATH)
-    module = importlib.util.module_from_spec(spec)
-
-    original_env = {key: os.environ.get(key) for key in env_overrides}
-    try:
-        for key, value in env_overrides.items():
-            os.environ[key] = str(value)
-        spec.loader.exec_module(module)  # type: ignore[attr-defined]
-    finally:
-        for key, value in original_env.items():
-            if value is None:
-                os.environ.pop(key, None)
-            else:
-                os.environ[key] = value
-        sys.modules.pop(module_name, None)
-
-    return module
+from conftest import load_fresh_loader
 
 
 def test_generate_ecommerce_order_respects_probability_zero():
-    loader = load_loader_module({"ECOMMERCE_PROBABILITY": "0"})
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "0"})
     assert loader.generate_ecommerce_order() is None
 
 
@@ -49,13 +20,13 @@ def test_generate_ecommerce_order_within_configured_bounds():
         "ECOMMERCE_SHIPPING_RATES": "0",
         "ECOMMERCE_TAX_RATE": "0.05",
     }
-    loader = load_loader_module(overrides)
+    loader = load_fresh_loader(overrides)
 
     loader.random.seed(12345)
     order = loader.generate_ecommerce_order()
     assert order is not None, "Expected ecommerce order when probability forced to 1"
 
-    order_id, items_json, revenue, subtotal, tax, shipping = order
+    order_id, items, revenue, subtotal, tax, shipping = order
 
     assert len(order_id) == 8
 
@@ -67,7 +38,6 @@ def test_generate_ecommerce_order_within_configured_bounds():
     assert tax >= 0
     assert shipping == 0
 
-    items = json.loads(items_json)
     assert len(items) >= 1
     for item in items:
         sku, name, category, price, quantity = item
@@ -77,10 +47,62 @@ def test_generate_ecommerce_order_within_configured_bounds():
         assert price > 0
         assert quantity >= 1
 
-    calculated_subtotal = sum(item[3] * item[4] for item in items)
-    calculated_tax = round((calculated_subtotal + shipping) * 0.05, 2)
-    calculated_revenue = round(calculated_subtotal + shipping + calculated_tax, 2)
-
-    assert pytest.approx(calculated_subtotal, rel=1e-6) == subtotal
-    assert pytest.approx(calculated_tax, rel=1e-6) == tax
-    assert pytest.approx(calculated_revenue, rel=1e-6) == revenue
+    # Totals are exact in cents, with tax rounded half up
+    subtotal_cents = sum(round(item[3] * 100) * item[4] for item in items)
+    shipping_cents = round(shipping * 100)
+    tax_cents = int(
+        (Decimal(subtotal_cents + shipping_cents) * Decimal("0.05")).quantize(Decimal(1), ROUND_HALF_UP)
+    )
+
+    assert subtotal == subtotal_cents / 100
+    assert tax == tax_cents / 100
+    assert revenue == (subtotal_cents + shipping_cents + tax_cents) / 100
+
+
+def test_flat_product_json_prefixes_are_valid_json():
+    loader = load_fresh_loader({})
+    for category, product, json_prefix in loader._FLAT_PRODUCTS:
+        item = json.loads(json_prefix + "12.5,2]")
+        assert item == [product["sku"], product["name"], category, 12.5, 2]
+
+
+def test_encode_ecommerce_items_matches_encoder():
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "1", "ECOMMERCE_ITEMS_MAX": "5"})
+    loader.random.seed(7)
+    for _ in range(20):
+        items = loader.generate_ecommerce_order()[1]
+        assert loader.encode_ecommerce_items(items) == json.dumps(items, separators=(",", ":"))
+
+
+def test_generate_ecommerce_order_force_ignores_probability():
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "0"})
+    order = loader.generate_ecommerce_order(force=True)
+    assert order is not None
+    assert loader.ECOMMERCE_PROBABILITY == 0.0
+
+
+def test_funnel_order_applies_step_overrides():
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "0"})
+    order_id, items, revenue, subtotal, tax, shipping = loader._generate_funnel_order(
+        {"ecommerce_revenue": 42, "ecommerce_shipping": 0}
+    )
+    assert revenue == 42.0
+    assert shipping == 0.0
+    assert items
+
+
+def test_generate_ecommerce_order_uses_runtime_tax_rate(monkeypatch):
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "1", "ECOMMERCE_TAX_RATE": "0.10"})
+    monkeypatch.setattr(loader, "ECOMMERCE_TAX_RATE", 0.0)
+    for _ in range(20):
+        assert loader.generate_ecommerce_order()[4] == 0
+
+
+def test_generate_ecommerce_order_keeps_sub_basis_point_tax_rate():
+    loader = load_fresh_loader({"ECOMMERCE_PROBABILITY": "1", "ECOMMERCE_TAX_RATE": "0.08875"})
+    loader.random.seed(3)
+    for _ in range(50):
+        _, items, revenue, subtotal, tax, shipping = loader.generate_ecommerce_order()
+        base_cents = round(subtotal * 100) + round(shipping * 100)
+        expected = (Decimal(base_cents) * Decimal("0.08875")).quantize(Decimal(1), ROUND_HALF_UP)
+        assert tax == int(expected) / 100
@@ -1,23 +1,10 @@
-import importlib.util
 import json
-import pathlib
-import uuid
 
-
-HERE = pathlib.Path(__file__).resolve().parents[1]
-LOADER_PATH = str(HERE / "loader.py")
-
-
-def load_loader():
-    module_name = f"loader_funnels_test_{uuid.uuid4().hex}"
-    spec = importlib.util.spec_from_file_location(module_name, LOADER_PATH)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)  # type: ignore[attr-defined]
-    return module
+from conftest import load_fresh_loader
 
 
 def test_load_funnels_from_file(tmp_path):
-    module = load_loader()
+    module = load_fresh_loader()
 
     funnel_data = [
         {
@@ -69,8 +56,8 @@ def test_load_funnels_from_file(tmp_path):
 
 
 def test_select_funnel_probability():
-    module = load_loader()
-    module.FUNNELS = [
+    module = load_fresh_loader()
+    module.set_funnels([
         {
             "name": "Always",
             "probability": 1.0,
@@ -78,7 +65,7 @@ def test_select_funnel_probability():
             "exit_after_completion": True,
             "steps": [{"type": "pageview", "url": "https://example.com", "delay_seconds_min": 0, "delay_seconds_max": 0}],
         }
-    ]
+    ])
 
     module.random.seed(1)
     selected = module.select_funnel()
@@ -88,3 +75,52 @@ def test_select_funnel_probability():
     module.FUNNELS[0]["probability"] = 0.0
     module.random.seed(1)
     assert module.select_funnel() is None
+
+
+def test_select_funnel_skips_when_no_probability():
+    module = load_fresh_loader()
+    module.set_funnels([
+        {
+            "name": "Never",
+            "probability": 0.0,
+            "priority": 0,
+            "exit_after_completion": True,
+            "steps": [{"type": "pageview", "url": "https://example.com"}],
+        }
+    ])
+
+    assert module._HAS_FUNNELS is False
+    assert module.select_funnel() is None
+
+
+def test_execute_funnel_sends_each_step(monkeypatch):
+    import asyncio
+
+    module = load_fresh_loader()
+    hits = []
+
+    async def fake_send_hit(session, params, headers):
+        hits.append(dict(params))
+        return 204
+
+    monkeypatch.setattr(module, "send_hit", fake_send_hit)
+    funnel = {
+        "name": "Checkout",
+        "exit_after_completion": False,
+        "steps": [
+            {"type": "pageview", "url": "https://example.com/cart"},
+            {"type": "event", "event_category": "CTA", "event_action": "Click", "event_name": "Pay"},
+            {"type": "download", "target_url": "/files/receipt.pdf"},
+        ],
+    }
+
+    exit_after = asyncio.run(module.execute_funnel(None, funnel, ["https://example.com"]))
+
+    assert exit_after is False
+    assert len(hits) == 3
+    assert len({hit["_id"] for hit in hits}) == 1
+    assert hits[0]["new_visit"] == 1
+    assert hits[0]["action_name"] == "Funnel: Checkout (1/3)"
+    assert hits[1]["e_n"] == "Pay"
+    assert hits[1]["urlref"] == "https://example.com/cart"
+    assert hits[2]["download"] == "https://example.com/files/receipt.pdf"
@@ -0,0 +1,52 @@
+import ipaddress
+from collections import Counter
+
+from conftest import load_fresh_loader
+
+
+def test_choose_country_and_ip_stays_within_country_ranges():
+    loader = load_fresh_loader({"RANDOMIZE_VISITOR_COUNTRIES": "true"})
+    for _ in range(500):
+        country, ip = loader.choose_country_and_ip()
+        address = ipaddress.ip_address(ip)
+        networks = [ipaddress.ip_network(r) for r in loader.COUNTRY_IP_RANGES[country]["ip_ranges"]]
+        matching = [net for net in networks if address in net]
+        assert matching
+        assert all(address not in (net.network_address, net.broadcast_address) for net in matching)
+
+
+def test_choose_country_and_ip_follows_country_probabilities():
+    loader = load_fresh_loader({"RANDOMIZE_VISITOR_COUNTRIES": "true"})
+    draws = 20000
+    counts = Counter(loader.choose_country_and_ip()[0] for _ in range(draws))
+    for country, config in loader.COUNTRY_IP_RANGES.items():
+        assert abs(counts[country] / draws - config["probability"]) < 0.02
+
+
+def test_choose_countries_and_ips_batch_matches_ranges():
+    loader = load_fresh_loader({"RANDOMIZE_VISITOR_COUNTRIES": "true"})
+    countries, ips = loader.choose_countries_and_ips(500)
+    assert len(countries) == len(ips) == 500
+    for country, ip in zip(countries, ips):
+        address = ipaddress.ip_address(ip)
+        networks = [ipaddress.ip_network(r) for r in loader.COUNTRY_IP_RANGES[country]["ip_ranges"]]
+        assert any(address in net for net in networks)
+
+
+def test_choose_country_and_ip_disabled():
+    loader = load_fresh_loader({"RANDOMIZE_VISITOR_COUNTRIES": "false"})
+    assert loader.choose_country_and_ip() == (None, None)
+    assert loader.choose_countries_and_ips(3) == ([None] * 3, [None] * 3)
+
+
+def test_country_ranges_all_have_host_addresses():
+    loader = load_fresh_loader()
+    assert loader._TOO_SMALL_COUNTRY_RANGES == []
+    assert all(host_count >= 1 for _, _, host_count in loader._FLAT_COUNTRY_RANGES)
+
+
+def test_choose_country_and_ip_honours_runtime_toggle(monkeypatch):
+    loader = load_fresh_loader({"RANDOMIZE_VISITOR_COUNTRIES": "true"})
+    monkeypatch.setattr(loader, "RANDOMIZE_VISITOR_COUNTRIES", False)
+    assert loader.choose_country_and_ip() == (None, None)
+    assert loader.choose_countries_and_ips(2) == ([None] * 2, [None] * 2)
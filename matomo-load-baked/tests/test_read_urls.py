@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import load_fresh_loader
+
+
+def test_read_urls_skips_comments_and_dedupes(tmp_path: Path):
+    urls_file = tmp_path / "urls.txt"
+    urls_file.write_text(
+        "# comment\n"
+        "\n"
+        "https://example.com/a  extra words\n"
+        "  https://example.com/b\n"
+        "https://example.com/a\n",
+        encoding="utf-8",
+    )
+    loader = load_fresh_loader()
+    assert loader.read_urls(urls_file) == ("https://example.com/a", "https://example.com/b")
+
+
+def test_read_urls_rejects_empty_file(tmp_path: Path):
+    urls_file = tmp_path / "urls.txt"
+    urls_file.write_text("# nothing here\n", encoding="utf-8")
+    loader = load_fresh_loader()
+    with pytest.raises(RuntimeError):
+        loader.read_urls(urls_file)
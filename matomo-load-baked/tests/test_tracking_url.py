@@ -0,0 +1,56 @@
+import urllib.parse
+
+from conftest import load_fresh_loader
+
+
+def test_build_tracking_url_includes_base_params():
+    loader = load_fresh_loader({"MATOMO_SITE_ID": "7", "MATOMO_TOKEN_AUTH": "secret"})
+    url = loader.build_tracking_url({"url": "https://example.com/a b", "cdt": "2025-01-01 10:00:00"})
+
+    base, query = url.split("?", 1)
+    assert base == loader.MATOMO_URL
+    parsed = dict(urllib.parse.parse_qsl(query))
+    assert parsed["idsite"] == "7"
+    assert parsed["rec"] == "1"
+    assert parsed["token_auth"] == "secret"
+    assert parsed["url"] == "https://example.com/a b"
+    assert parsed["cdt"] == "2025-01-01 10:00:00"
+    assert " " not in query
+
+
+def test_build_tracking_url_omits_empty_token():
+    loader = load_fresh_loader({"MATOMO_TOKEN_AUTH": ""})
+    query = loader.build_tracking_url({"url": "https://example.com"}).split("?", 1)[1]
+    assert "token_auth" not in dict(urllib.parse.parse_qsl(query))
+
+
+def test_encode_params_matches_urlencode():
+    loader = load_fresh_loader({})
+    params = {
+        "_id": "abcdef0123456789",
+        "url": "https://example.com/ä?q=1&x=2",
+        "action_name": "Event: Click - Buy now/Checkout",
+        "rand": 123456,
+        "new_visit": 1,
+        "e_v": 2.5,
+        "ec_items": '[["SKU-1","Name","Cat",9.99,1]]',
+        "ping": True,
+    }
+    assert loader._encode_params(params) == urllib.parse.urlencode(params, quote_via=urllib.parse.quote)
+
+
+def test_encode_params_caches_only_repeating_values():
+    loader = load_fresh_loader({})
+    params = {
+        "_id": "abcdef0123456789",
+        "url": "https://example.com/a",
+        "urlref": "https://example.com/",
+        "action_name": "LoadTest PV 1/2",
+        "cdt": "2024-10-01 12:00:00",
+        "pv_id": "a1b2c3",
+    }
+    loader._encode_params(params)
+    loader._encode_params(params)
+    info = loader._quote_repeated.cache_info()
+    assert info.currsize == 3
+    assert info.hits == 3
@@ -0,0 +1,129 @@
+import asyncio
+
+from conftest import load_fresh_loader
+
+
+def run_visit(loader, monkeypatch, urls=("https://example.com/a", "https://example.com/b")):
+    """Run one visit with send_hit captured instead of hitting the network."""
+    hits = []
+
+    async def fake_send_hit(session, params, headers):
+        hits.append((dict(params), headers))
+        return 204
+
+    monkeypatch.setattr(loader, "send_hit", fake_send_hit)
+    monkeypatch.setattr(loader, "PAUSE_BETWEEN_PVS_MIN", 0.0)
+    monkeypatch.setattr(loader, "PAUSE_BETWEEN_PVS_MAX", 0.0)
+    asyncio.run(loader.visit(None, list(urls)))
+    return hits
+
+
+def test_visit_sends_pageviews_then_ping(monkeypatch):
+    loader = load_fresh_loader()
+    monkeypatch.setattr(loader, "PAGEVIEWS_MIN", 4)
+    monkeypatch.setattr(loader, "PAGEVIEWS_MAX", 4)
+
+    hits = run_visit(loader, monkeypatch)
+
+    assert len(hits) == 5
+    pageviews, (ping, _) = hits[:-1], hits[-1]
+    visitor_ids = {params["_id"] for params, _ in hits}
+    assert len(visitor_ids) == 1
+    assert pageviews[0][0]["new_visit"] == 1
+    assert all("new_visit" not in params for params, _ in pageviews[1:])
+    assert ping["ping"] == 1
+    assert ping["pv_id"] == pageviews[-1][0]["pv_id"]
+
+
+def test_visit_reuses_user_agent_for_all_hits(monkeypatch):
+    loader = load_fresh_loader()
+    hits = run_visit(loader, monkeypatch)
+
+    user_agents = {headers["User-Agent"] for _, headers in hits}
+    assert len(user_agents) == 1
+    assert user_agents.pop() in loader.USER_AGENTS
+
+
+def test_visit_bulk_tracking_sends_one_batch(monkeypatch):
+    loader = load_fresh_loader()
+    monkeypatch.setattr(loader, "BULK_TRACKING", True)
+    monkeypatch.setattr(loader, "PAGEVIEWS_MIN", 3)
+    monkeypatch.setattr(loader, "PAGEVIEWS_MAX", 3)
+    batches = []
+
+    async def fake_send_bulk(session, hits, headers):
+        batches.append([dict(params) for params in hits])
+        return 200
+
+    monkeypatch.setattr(loader, "send_bulk", fake_send_bulk)
+    hits = run_visit(loader, monkeypatch)
+
+    assert hits == []
+    assert len(batches) == 1
+    batch = batches[0]
+    assert len(batch) == 4
+    assert batch[0]["new_visit"] == 1
+    assert batch[-1]["ping"] == 1
+    assert batch[-1]["pv_id"] == batch[-2]["pv_id"]
+    queries = [loader.build_tracking_query(params) for params in batch]
+    assert all(query.startswith("?idsite=") for query in queries)
+
+
+def test_visit_parallel_pvs_sends_ping_after_every_pageview(monkeypatch):
+    loader = load_fresh_loader({"PARALLEL_PVS": "true"})
+    monkeypatch.setattr(loader, "PAGEVIEWS_MIN", 3)
+    monkeypatch.setattr(loader, "PAGEVIEWS_MAX", 3)
+
+    hits = run_visit(loader, monkeypatch)
+
+    assert len(hits) == 4
+    pv_ids = [params["pv_id"] for params, _ in hits[:-1]]
+    assert len(set(pv_ids)) == 3
+    assert hits[-1][0]["ping"] == 1
+    assert hits[-1][0]["pv_id"] == pv_ids[-1]
+
+
+def test_visit_parallel_pvs_cancellation_reaches_pending_hits(monkeypatch):
+    loader = load_fresh_loader({"PARALLEL_PVS": "true"})
+    monkeypatch.setattr(loader, "PAGEVIEWS_MIN", 3)
+    monkeypatch.setattr(loader, "PAGEVIEWS_MAX", 3)
+    monkeypatch.setattr(loader, "PAUSE_BETWEEN_PVS_MIN", 10.0)
+    monkeypatch.setattr(loader, "PAUSE_BETWEEN_PVS_MAX", 10.0)
+    sent = []
+
+    async def fake_send_hit(session, params, headers):
+        sent.append(params)
+        return 204
+
+    monkeypatch.setattr(loader, "send_hit", fake_send_hit)
+
+    async def scenario():
+        task = asyncio.create_task(loader.visit(None, ["https://example.com/a"]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Give any orphaned hit a chance to fire; none should
+        await asyncio.sleep(0.05)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    leftover = asyncio.run(scenario())
+
+    assert leftover == []
+    assert len(sent) == 1
+    assert "ping" not in sent[0]
+
+def test_rand_hex_is_fixed_width_hex():
+    loader = load_fresh_loader()
+    for n in (6, 16):
+        values = [loader.rand_hex(n) for _ in range(200)]
+        assert all(len(value) == n for value in values)
+        assert all(set(value) <= set("0123456789abcdef") for value in values)
+
+
+def test_choose_referrer_reads_direct_probability_at_call_time(monkeypatch):
+    loader = load_fresh_loader()
+    monkeypatch.setattr(loader, "DIRECT_TRAFFIC_PROBABILITY", 1.0)
+    assert all(loader.choose_referrer() is None for _ in range(200))
@@ -18,8 +18,10 @@ import os
 import sys
 import asyncio
 import aiohttp
-from datetime import datetime, timedelta
+from urllib.parse import quote, urlencode
+from datetime import datetime, time, timedelta
 import pytz
+from yarl import URL
 
 # Add the loader module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'matomo-load-baked'))
@@ -32,7 +34,22 @@ MATOMO_TOKEN_AUTH = os.environ.get("MATOMO_TOKEN_AUTH", "")  # Required for back
 # Test configuration
 TEST_DAYS_BACK = 3  # How many days back to backfill
 TEST_VISITS_PER_DAY = 5  # Small number for testing
+TEST_CONCURRENCY = 32  # Max visits in flight at once
+if not 0 < TEST_VISITS_PER_DAY <= 10000:
+    # visitor ids are "backfilltest" + 4 digits; larger counts would exceed 16 chars
+    raise ValueError("TEST_VISITS_PER_DAY must be between 1 and 10000")
 TIMEZONE = "CET"
+_TZ = pytz.timezone(TIMEZONE)
+_UTC = pytz.UTC
+
+# Query-string params shared by every backfill visit, encoded once
+_STATIC_QS = urlencode({
+    'idsite': MATOMO_SITE_ID,
+    'rec': 1,
+    'token_auth': MATOMO_TOKEN_AUTH,
+    'new_visit': 1,
+    'send_image': 0,
+}, quote_via=quote)
 
 
 def check_config():
@@ -57,7 +74,7 @@ def check_config():
     return True
 
 
-async def test_matomo_connection():
+async def test_matomo_connection(session):
     """Test basic connectivity to Matomo."""
     print("\n🔗 Testing Matomo connectivity...")
     
@@ -72,49 +89,47 @@ async def test_matomo_connection():
         'send_image': 0,
     }
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(MATOMO_URL, params=params, timeout=10) as resp:
-                if resp.status == 200 or resp.status == 204:
-                    print(f"   ✅ Matomo responded with status {resp.status}")
-                    return True
-                else:
-                    print(f"   ❌ Matomo responded with status {resp.status}")
-                    return False
-        except Exception as e:
-            print(f"   ❌ Connection failed: {e}")
-            return False
+    try:
+        async with session.get(MATOMO_URL, params=params, timeout=10) as resp:
+            if resp.status == 200 or resp.status == 204:
+                print(f"   ✅ Matomo responded with status {resp.status}")
+                return True
+            else:
+                print(f"   ❌ Matomo responded with status {resp.status}")
+                return False
+    except Exception as e:
+        print(f"   ❌ Connection failed: {e}")
+        return False
 
 
-async def test_backfill_single_visit(session, date, visit_num):
-    """Send a single backfill visit and return success status."""
-    tz = pytz.timezone(TIMEZONE)
+async def test_backfill_single_visit(session, date, visit_num, date_midnight):
+    """Send a single backfill visit and return success status.
     
+    date_midnight is the naive local midnight of date, built once per date by the caller.
+    """
     # Create a visit time during business hours on the target date
     hour = 9 + (visit_num % 8)  # 9am-4pm
     minute = (visit_num * 17) % 60  # Spread minutes
     
-    local_dt = tz.localize(datetime(date.year, date.month, date.day, hour, minute, 0))
-    utc_dt = local_dt.astimezone(pytz.UTC)
-    cdt_timestamp = utc_dt.strftime('%Y-%m-%d %H:%M:%S')
+    local_dt = _TZ.localize(date_midnight + timedelta(hours=hour, minutes=minute))
+    cdt_timestamp = local_dt.astimezone(_UTC).strftime('%Y-%m-%d %H:%M:%S')
     
-    visitor_id = f"backfilltest{visit_num:04d}"[:16].ljust(16, '0')
+    # 12-char prefix + 4 digits = 16 chars, the _id length Matomo expects (not hex)
+    visitor_id = "backfilltest%04d" % visit_num
     
-    params = {
-        'idsite': MATOMO_SITE_ID,
-        'rec': 1,
-        'url': f'http://backfill-test.example.com/page-{visit_num}',
-        'action_name': f'Backfill Test Page {visit_num} - {date}',
-        '_id': visitor_id,
-        'rand': hash(f"{date}-{visit_num}") % (2**31),
-        'cdt': cdt_timestamp,
-        'token_auth': MATOMO_TOKEN_AUTH,
-        'new_visit': 1,
-        'send_image': 0,
-    }
+    # Knuth multiplicative mix: deterministic across runs, no string building
+    rand = ((date.toordinal() * 2654435761) ^ visit_num) & 0x7fffffff
+    
+    # Only the per-visit params are encoded here; the rest comes from _STATIC_QS
+    url = (
+        f"{MATOMO_URL}?{_STATIC_QS}"
+        f"&url={quote(f'http://backfill-test.example.com/page-{visit_num}', safe='')}"
+        f"&action_name={quote(f'Backfill Test Page {visit_num} - {date}', safe='')}"
+        f"&_id={visitor_id}&rand={rand}&cdt={quote(cdt_timestamp, safe='')}"
+    )
     
     try:
-        async with session.get(MATOMO_URL, params=params, timeout=10) as resp:
+        async with session.get(URL(url, encoded=True), timeout=10) as resp:
             status = resp.status
             if status in (200, 204):
                 return True, cdt_timestamp
@@ -125,12 +140,11 @@ async def test_backfill_single_visit(session, date, visit_num):
         return False, str(e)
 
 
-async def run_backfill_test():
+async def run_backfill_test(session):
     """Run the backfill test."""
     print("\n🚀 Starting Backfill Test...")
     
-    tz = pytz.timezone(TIMEZONE)
-    today = datetime.now(tz).date()
+    today = datetime.now(_TZ).date()
     
     # Calculate test date range
     start_date = today - timedelta(days=TEST_DAYS_BACK)
@@ -145,26 +159,37 @@ async def run_backfill_test():
         'by_date': {}
     }
     
-    async with aiohttp.ClientSession() as session:
-        for date in dates:
-            date_str = str(date)
+    # Send all visits concurrently over the shared session; the semaphore keeps at
+    # most TEST_CONCURRENCY in flight so the server isn't overwhelmed
+    jobs = [(date, visit_num) for date in dates for visit_num in range(TEST_VISITS_PER_DAY)]
+    midnights = {date: datetime.combine(date, time()) for date in dates}
+    semaphore = asyncio.Semaphore(TEST_CONCURRENCY)
+    
+    async def bounded(date, visit_num):
+        async with semaphore:
+            return await test_backfill_single_visit(session, date, visit_num, midnights[date])
+    
+    outcomes = await asyncio.gather(
+        *(bounded(date, visit_num) for date, visit_num in jobs),
+        return_exceptions=True,
+    )
+    
+    # Report in date order once everything has been sent
+    for (date, visit_num), outcome in zip(jobs, outcomes):
+        date_str = str(date)
+        if date_str not in results['by_date']:
             results['by_date'][date_str] = {'success': 0, 'failed': 0}
             print(f"\n   📆 Processing {date_str}...")
-            
-            for visit_num in range(TEST_VISITS_PER_DAY):
-                success, detail = await test_backfill_single_visit(session, date, visit_num)
-                
-                if success:
-                    results['success'] += 1
-                    results['by_date'][date_str]['success'] += 1
-                    print(f"      ✅ Visit {visit_num + 1}/{TEST_VISITS_PER_DAY} -> cdt={detail}")
-                else:
-                    results['failed'] += 1
-                    results['by_date'][date_str]['failed'] += 1
-                    print(f"      ❌ Visit {visit_num + 1}/{TEST_VISITS_PER_DAY} FAILED: {detail}")
-                
-                # Small delay to avoid overwhelming the server
-                await asyncio.sleep(0.1)
+        
+        success, detail = (False, str(outcome)) if isinstance(outcome, BaseException) else outcome
+        if success:
+            results['success'] += 1
+            results['by_date'][date_str]['success'] += 1
+            print(f"      ✅ Visit {visit_num + 1}/{TEST_VISITS_PER_DAY} -> cdt={detail}")
+        else:
+            results['failed'] += 1
+            results['by_date'][date_str]['failed'] += 1
+            print(f"      ❌ Visit {visit_num + 1}/{TEST_VISITS_PER_DAY} FAILED: {detail}")
     
     return results
 
@@ -214,13 +239,21 @@ async def main():
     if not check_config():
         sys.exit(1)
     
-    # Test connectivity
-    if not await test_matomo_connection():
-        print("\n❌ Cannot connect to Matomo. Please check the URL and ensure Matomo is running.")
-        sys.exit(1)
-    
-    # Run backfill test
-    results = await run_backfill_test()
+    # One keep-alive session for the connectivity check and every backfill visit
+    connector = aiohttp.TCPConnector(
+        limit=TEST_CONCURRENCY,
+        keepalive_timeout=30,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=True,
+    )
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Test connectivity
+        if not await test_matomo_connection(session):
+            print("\n❌ Cannot connect to Matomo. Please check the URL and ensure Matomo is running.")
+            sys.exit(1)
+        
+        # Run backfill test
+        results = await run_backfill_test(session)
     
     # Print results
     print_results(results)
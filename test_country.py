@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 import random
 import ipaddress
+import itertools
+import logging
+import socket
+
+log = logging.getLogger(__name__)
 
 # Copy the exact logic from the loader.py
 COUNTRY_IP_RANGES = {
@@ -38,44 +43,75 @@ COUNTRY_IP_RANGES = {
     },
 }
 
+# Flattened (country, ip_range, first_address, host_count) entries with cumulative
+# weights, built once like in loader.py; CIDRs are parsed here rather than per call
+FLAT_COUNTRY_RANGES = [
+    (country, ip_range, int(network.network_address), network.num_addresses - 2)
+    for country, config in COUNTRY_IP_RANGES.items()
+    for ip_range, network in ((r, ipaddress.ip_network(r)) for r in config['ip_ranges'])
+]
+FLAT_COUNTRY_CUM_WEIGHTS = list(itertools.accumulate(
+    COUNTRY_IP_RANGES[country]['probability'] / len(COUNTRY_IP_RANGES[country]['ip_ranges'])
+    for country, *_ in FLAT_COUNTRY_RANGES
+))
+
+def host_ip(first_address, host_count):
+    """Random host in a range, avoiding the network and broadcast addresses (as in loader.py)"""
+    return socket.inet_ntoa((first_address + random.randint(1, host_count)).to_bytes(4, 'big'))
+
 def choose_country_and_ip():
     """Test the exact logic from the function"""
-    print("Testing choose_country_and_ip()...")
-    
-    rand = random.random()
-    print(f"Random value: {rand}")
-    current_prob = 0.0
+    log.debug("Testing choose_country_and_ip()...")
     
-    for country, config in COUNTRY_IP_RANGES.items():
-        current_prob += config['probability']
-        print(f"Checking {country}: current_prob = {current_prob}")
-        if rand < current_prob:
-            print(f"Selected country: {country}")
-            # Choose random IP range from this country
-            ip_range = random.choice(config['ip_ranges'])
-            print(f"Selected IP range: {ip_range}")
-            # Generate random IP within the chosen range
-            network = ipaddress.ip_network(ip_range)
-            print(f"Network: {network}, num_addresses: {network.num_addresses}")
-            # Get a random IP from the network (avoiding network and broadcast addresses)
-            random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-            print(f"Generated IP: {random_ip}")
-            return country, str(random_ip)
-    
-    # Fallback to US if probabilities don't add up
-    print("Fallback to US")
-    us_range = random.choice(COUNTRY_IP_RANGES['United States']['ip_ranges'])
-    network = ipaddress.ip_network(us_range)
-    random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-    return 'United States', str(random_ip)
+    # Country and IP range come from one weighted draw
+    country, ip_range, first_address, host_count = random.choices(
+        FLAT_COUNTRY_RANGES, cum_weights=FLAT_COUNTRY_CUM_WEIGHTS
+    )[0]
+    log.debug("Selected country: %s", country)
+    log.debug("Selected IP range: %s, host_count: %s", ip_range, host_count)
+    random_ip = host_ip(first_address, host_count)
+    log.debug("Generated IP: %s", random_ip)
+    return country, random_ip
+
+def choose_countries_and_ips(n):
+    """Draw n visitors at once, like loader.choose_countries_and_ips: one weighted choices() call."""
+    picks = random.choices(FLAT_COUNTRY_RANGES, cum_weights=FLAT_COUNTRY_CUM_WEIGHTS, k=n)
+    countries = [country for country, _, _, _ in picks]
+    ips = [host_ip(first_address, host_count) for _, _, first_address, host_count in picks]
+    return countries, ips
 
-# Test the function multiple times
-for i in range(5):
-    print(f"\n--- Test {i+1} ---")
+
+def main():
+    """Print a few sample draws and the country distribution of a large batch."""
+    # Test the single-visitor function once
+    print("\n--- Single draw ---")
     try:
         country, ip = choose_country_and_ip()
         print(f"Result: {country} -> {ip}")
     except Exception as e:
         print(f"ERROR: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+
+    # Draw several visitors in one batch call
+    countries, ips = choose_countries_and_ips(5)
+    for i, (country, ip) in enumerate(zip(countries, ips)):
+        print(f"\n--- Test {i+1} ---")
+        print(f"Result: {country} -> {ip}")
+
+    # Check the country distribution over a large batch
+    batch_size = 100000
+    print(f"\n--- Batch of {batch_size} visitors ---")
+    counts = {}
+    for country in choose_countries_and_ips(batch_size)[0]:
+        counts[country] = counts.get(country, 0) + 1
+    total_probability = sum(config['probability'] for config in COUNTRY_IP_RANGES.values())
+    for country, config in COUNTRY_IP_RANGES.items():
+        expected = config['probability'] / total_probability
+        print(f"{country}: {counts.get(country, 0) / batch_size:.3f} (expected {expected:.3f})")
+
+
+if __name__ == '__main__':
+    # Per-draw details are logged at DEBUG; lower the level to see them
+    logging.basicConfig(level=logging.INFO)
+    main()
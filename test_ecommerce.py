@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import os
-import json
 
 # Set environment variables for testing
 os.environ['ECOMMERCE_PROBABILITY'] = '1.0'  # Force ecommerce orders
@@ -16,6 +15,8 @@ import sys
 sys.path.append('./matomo-load-baked')
 from loader import generate_ecommerce_order, ECOMMERCE_PRODUCTS
 
+_REQUIRED_PRODUCT_KEYS = frozenset(('sku', 'name', 'price'))
+
 def test_ecommerce_order_generation():
     """Test ecommerce order generation"""
     print("Testing ecommerce order generation...")
@@ -25,8 +26,7 @@ def test_ecommerce_order_generation():
         
         order = generate_ecommerce_order()
         if order:
-            order_id, items_json, revenue, subtotal, tax, shipping = order
-            items = json.loads(items_json)
+            order_id, items, revenue, subtotal, tax, shipping = order
             
             print(f"Order ID: {order_id}")
             print(f"Revenue: ${revenue}")
@@ -39,19 +39,22 @@ def test_ecommerce_order_generation():
                 sku, name, category, price, qty = item
                 print(f"  - {qty}x {name} ({sku}) - {category} @ ${price} each")
             
-            # Verify calculations
-            calculated_subtotal = sum(item[3] * item[4] for item in items)
-            calculated_tax = round((calculated_subtotal + shipping) * 0.08, 2)
-            calculated_revenue = round(calculated_subtotal + shipping + calculated_tax, 2)
+            # Verify calculations in integer cents (tax rounded half up), so they match exactly
+            subtotal_cents = sum(round(item[3] * 100) * item[4] for item in items)
+            shipping_cents = round(shipping * 100)
+            tax_cents = ((subtotal_cents + shipping_cents) * 800 + 5000) // 10000  # 8% tax
+            calculated_subtotal = subtotal_cents / 100
+            calculated_tax = tax_cents / 100
+            calculated_revenue = (subtotal_cents + shipping_cents + tax_cents) / 100
             
             print(f"Verification:")
             print(f"  Subtotal: ${calculated_subtotal} (expected: ${subtotal})")
             print(f"  Tax: ${calculated_tax} (expected: ${tax})")
             print(f"  Revenue: ${calculated_revenue} (expected: ${revenue})")
             
-            assert abs(calculated_subtotal - subtotal) < 0.01, "Subtotal mismatch"
-            assert abs(calculated_tax - tax) < 0.01, "Tax mismatch"
-            assert abs(calculated_revenue - revenue) < 0.01, "Revenue mismatch"
+            assert calculated_subtotal == subtotal, "Subtotal mismatch"
+            assert calculated_tax == tax, "Tax mismatch"
+            assert calculated_revenue == revenue, "Revenue mismatch"
             print("  ✓ All calculations correct")
         else:
             print("No order generated (should not happen with 100% probability)")
@@ -66,11 +69,10 @@ def test_product_database():
         total_products += len(products)
         
         # Verify product structure
-        for product in products:
-            assert 'sku' in product, f"Missing SKU in {category}"
-            assert 'name' in product, f"Missing name in {category}"
-            assert 'price' in product, f"Missing price in {category}"
-            assert product['price'] > 0, f"Invalid price in {category}: {product['price']}"
+        assert all(_REQUIRED_PRODUCT_KEYS <= product.keys() for product in products), \
+            f"Missing sku/name/price in {category}"
+        min_price = min(product['price'] for product in products)
+        assert min_price > 0, f"Invalid price in {category}: {min_price}"
     
     print(f"Total products: {total_products}")
     print("✓ Product database structure valid")
@@ -11,20 +11,23 @@ test_ranges = [
     '163.172.0.0/16'
 ]
 
-for ip_range in test_ranges:
-    try:
-        network = ipaddress.ip_network(ip_range)
-        print(f"{ip_range}: num_addresses = {network.num_addresses}")
-        print(f"  network_address = {network.network_address}")
-        print(f"  broadcast_address = {network.broadcast_address}")
-        print(f"  range for random: 1 to {network.num_addresses - 2}")
-        
-        # Try generating a random IP
-        if network.num_addresses > 2:
-            random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-            print(f"  sample IP: {random_ip}")
-        else:
-            print(f"  ERROR: Network too small for random IP generation!")
-        print()
-    except Exception as e:
-        print(f"Error with {ip_range}: {e}")
\ No newline at end of file
+# Parse every range once into (cidr, network, first_address, host_count)
+RANGE_TABLE = [
+    (ip_range, network, int(network.network_address), network.num_addresses - 2)
+    for ip_range, network in ((r, ipaddress.ip_network(r)) for r in test_ranges)
+]
+
+# Ranges with no host addresses between the network and broadcast address
+INVALID = [ip_range for ip_range, _, _, host_count in RANGE_TABLE if host_count < 1]
+assert not INVALID, f"Networks too small for random IP generation: {INVALID}"
+
+for ip_range, network, first_address, host_count in RANGE_TABLE:
+    print(f"{ip_range}: num_addresses = {network.num_addresses}")
+    print(f"  network_address = {network.network_address}")
+    print(f"  broadcast_address = {network.broadcast_address}")
+    print(f"  range for random: 1 to {host_count}")
+    
+    # Try generating a random IP
+    random_ip = ipaddress.IPv4Address(first_address + random.randint(1, host_count))
+    print(f"  sample IP: {random_ip}")
+    print()
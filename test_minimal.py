@@ -2,6 +2,8 @@
 import os
 import random
 import ipaddress
+import itertools
+import socket
 
 # Exactly mirror the code from loader.py
 RANDOMIZE_VISITOR_COUNTRIES = os.environ.get("RANDOMIZE_VISITOR_COUNTRIES", "true").lower() == "true"
@@ -23,6 +25,18 @@ COUNTRY_IP_RANGES = {
     },
 }
 
+# Flattened (country, ip_range, first_address, host_count) entries with cumulative
+# weights, built once like in loader.py; CIDRs are parsed here rather than per call
+FLAT_COUNTRY_RANGES = [
+    (country, ip_range, int(network.network_address), network.num_addresses - 2)
+    for country, config in COUNTRY_IP_RANGES.items()
+    for ip_range, network in ((r, ipaddress.ip_network(r)) for r in config['ip_ranges'])
+]
+FLAT_COUNTRY_CUM_WEIGHTS = list(itertools.accumulate(
+    COUNTRY_IP_RANGES[country]['probability'] / len(COUNTRY_IP_RANGES[country]['ip_ranges'])
+    for country, *_ in FLAT_COUNTRY_RANGES
+))
+
 def choose_country_and_ip():
     """Choose a country based on realistic distribution and generate an IP from that country.
     
@@ -36,38 +50,21 @@ def choose_country_and_ip():
         return None, None
     
     print("DEBUG: Starting country selection...")
-    rand = random.random()
-    print(f"DEBUG: rand={rand}")
-    current_prob = 0.0
-    
-    for country, config in COUNTRY_IP_RANGES.items():
-        current_prob += config['probability']
-        print(f"DEBUG: country={country}, current_prob={current_prob}")
-        if rand < current_prob:
-            print(f"DEBUG: Selected country: {country}")
-            # Choose random IP range from this country
-            ip_range = random.choice(config['ip_ranges'])
-            print(f"DEBUG: Selected IP range: {ip_range}")
-            
-            # Generate random IP within the chosen range
-            network = ipaddress.ip_network(ip_range)
-            print(f"DEBUG: Network: {network}, num_addresses={network.num_addresses}")
-            
-            # Get a random IP from the network (avoiding network and broadcast addresses)
-            try:
-                random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-                print(f"DEBUG: Generated IP: {random_ip}")
-                return country, str(random_ip)
-            except Exception as e:
-                print(f"ERROR generating IP: {e}")
-                return None, None
+    # Country and IP range come from one weighted draw
+    country, ip_range, first_address, host_count = random.choices(
+        FLAT_COUNTRY_RANGES, cum_weights=FLAT_COUNTRY_CUM_WEIGHTS
+    )[0]
+    print(f"DEBUG: Selected country: {country}")
+    print(f"DEBUG: Selected IP range: {ip_range}, host_count={host_count}")
     
-    # Fallback to US if probabilities don't add up
-    print("DEBUG: Fallback to US")
-    us_range = random.choice(COUNTRY_IP_RANGES['United States']['ip_ranges'])
-    network = ipaddress.ip_network(us_range)
-    random_ip = network.network_address + random.randint(1, network.num_addresses - 2)
-    return 'United States', str(random_ip)
+    # Get a random IP from the network (avoiding network and broadcast addresses)
+    try:
+        random_ip = socket.inet_ntoa((first_address + random.randint(1, host_count)).to_bytes(4, 'big'))
+        print(f"DEBUG: Generated IP: {random_ip}")
+        return country, random_ip
+    except Exception as e:
+        print(f"ERROR generating IP: {e}")
+        return None, None
 
 # Test the function
 print("Testing choose_country_and_ip()...")
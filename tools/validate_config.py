@@ -13,6 +13,7 @@ Matomo connectivity before starting the load generator.
 import argparse
 import asyncio
 import os
+import re
 import sys
 from typing import Dict
 
@@ -51,28 +52,28 @@ ENV_TO_CONFIG_KEY = {
     "ECOMMERCE_CURRENCY": "ecommerce_currency",
     "TIMEZONE": "timezone",
 }
+_KNOWN_ENV_KEYS = frozenset(ENV_TO_CONFIG_KEY)
+
+
+# One KEY=VALUE line: comment and blank lines never match, and both key and value
+# come out with surrounding whitespace already trimmed
+_ENV_LINE_RE = re.compile(r"^[^\S\n]*(?:([^\s=#][^=\n]*?)[^\S\n]*)?=[^\S\n]*(.*?)[^\S\n]*$", re.MULTILINE)
 
 
 def parse_env_file(path: str) -> Dict[str, str]:
-    env: Dict[str, str] = {}
+    """Read the variables build_config() uses from an env file; others are skipped."""
     with open(path, encoding="utf-8") as handle:
-        for line in handle:
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-            if "=" not in stripped:
-                continue
-            key, value = stripped.split("=", 1)
-            env[key.strip()] = value.strip().strip('"').strip("'")
-    return env
+        data = handle.read()
+    return {
+        key: match.group(2).strip('"').strip("'")
+        for match in _ENV_LINE_RE.finditer(data)
+        if (key := match.group(1)) in _KNOWN_ENV_KEYS
+    }
 
 
 def build_config(env: Dict[str, str]) -> Dict[str, str]:
-    config: Dict[str, str] = {}
-    for env_key, config_key in ENV_TO_CONFIG_KEY.items():
-        if env_key in env:
-            config[config_key] = env[env_key]
-    return config
+    # Only the variables present in both; key order doesn't matter to the validator
+    return {ENV_TO_CONFIG_KEY[env_key]: env[env_key] for env_key in ENV_TO_CONFIG_KEY.keys() & env.keys()}
 
 
 async def main() -> int:
@@ -99,7 +100,14 @@ async def main() -> int:
         env.update(parse_env_file(args.env_file))
 
     config = build_config(env)
-    validation = ConfigValidator.validate_config(config)
+    matomo_url = config.get("matomo_url")
+
+    # Start the connectivity probe right away so its DNS/TCP setup overlaps with
+    # validation, which runs in a worker thread; the result is only reported below
+    probe = None
+    if not args.skip_connection and matomo_url:
+        probe = asyncio.ensure_future(ConfigValidator.test_matomo_connection(matomo_url, args.timeout))
+    validation = await asyncio.to_thread(ConfigValidator.validate_config, config)
 
     print("Configuration validation:")
     if validation.valid:
@@ -108,6 +116,9 @@ async def main() -> int:
         print("  ❌ Configuration invalid")
         for error in validation.errors:
             print(f"    - [{error.severity.upper()}] {error.field}: {error.message}")
+        if probe is not None:
+            probe.cancel()
+            await asyncio.gather(probe, return_exceptions=True)
         return 1
 
     if validation.warnings:
@@ -117,14 +128,13 @@ async def main() -> int:
     if args.skip_connection:
         return 0
 
-    matomo_url = config.get("matomo_url")
-    if not matomo_url:
+    if probe is None:
         print("  ℹ️  Skipping connectivity test (MATOMO_URL not provided).")
         return 0
 
     print(f"\nTesting Matomo connectivity ({matomo_url})...")
     try:
-        result = await ConfigValidator.test_matomo_connection(matomo_url, args.timeout)
+        result = await probe
     except Exception as exc:  # pragma: no cover
         print(f"  ❌ Connectivity test failed: {exc}")
         return 1